@@ -12,6 +12,11 @@ def mock_media(settings):
         yield temp_directory
 
 
+@pytest.fixture(autouse=True)
+def sync_thumbnails(settings):
+    settings.POST_THUMBNAIL_WORKERS = 0
+
+
 @pytest.fixture
 def mixer():
     return _mixer
@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.functional import cached_property
+
+
+class TwoLevelCache(BaseCache):
+    """
+    Небольшой LRU-кеш в памяти процесса перед общим кешем.
+
+    LOCATION — имя общего кеша из CACHES. В памяти записи живут не
+    дольше OPTIONS['L1_TIMEOUT'] секунд, их не больше
+    OPTIONS['L1_MAX_ENTRIES']. Ключи с префиксами из
+    OPTIONS['L1_BYPASS'] (версии тегов, счётчики) читаются только из
+    общего кеша: их меняют другие процессы.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._l2_alias = location
+        self._max_entries = options.get('L1_MAX_ENTRIES', 1000)
+        self._l1_timeout = options.get('L1_TIMEOUT', 5)
+        self._bypass = tuple(options.get('L1_BYPASS', ('tag:', 'feed_count:')))
+        self._l1 = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = Counter()
+
+    @cached_property
+    def l2(self):
+        return caches[self._l2_alias]
+
+    def _local(self, key):
+        return not key.startswith(self._bypass)
+
+    def _l1_get(self, key):
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._l1[key]
+                return None
+            self._l1.move_to_end(key)
+            return entry
+
+    def _l1_set(self, key, value):
+        with self._lock:
+            self._l1[key] = (time.monotonic() + self._l1_timeout, value)
+            self._l1.move_to_end(key)
+            while len(self._l1) > self._max_entries:
+                self._l1.popitem(last=False)
+
+    def _l1_delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._l1.pop(key, None)
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        found = {}
+        missing = []
+        for key in keys:
+            entry = self._l1_get(key) if self._local(key) else None
+            if entry is None:
+                missing.append(key)
+            else:
+                found[key] = entry[1]
+        self.stats['l1'] += len(found)
+        if missing:
+            shared = self.l2.get_many(missing, version)
+            self.stats['l2'] += len(shared)
+            self.stats['misses'] += len(missing) - len(shared)
+            for key, value in shared.items():
+                if self._local(key):
+                    self._l1_set(key, value)
+            found.update(shared)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l2.set(key, value, timeout, version)
+        if self._local(key):
+            self._l1_set(key, value)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.l2.set_many(data, timeout, version)
+        for key, value in data.items():
+            if self._local(key) and key not in failed:
+                self._l1_set(key, value)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._l1_delete(key)
+        return self.l2.add(key, value, timeout, version)
+
+    def incr(self, key, delta=1, version=None):
+        self._l1_delete(key)
+        return self.l2.incr(key, delta, version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.l2.touch(key, timeout, version)
+
+    def has_key(self, key, version=None):
+        if self._local(key) and self._l1_get(key) is not None:
+            return True
+        return self.l2.has_key(key, version)
+
+    def delete(self, key, version=None):
+        self._l1_delete(key)
+        self.l2.delete(key, version)
+
+    def delete_many(self, keys, version=None):
+        self._l1_delete(*keys)
+        self.l2.delete_many(keys, version)
+
+    def clear(self):
+        with self._lock:
+            self._l1.clear()
+        self.l2.clear()
@@ -0,0 +1,128 @@
+import multiprocessing
+import random
+import shutil
+import tempfile
+import time
+from collections import Counter
+from contextlib import contextmanager
+from itertools import accumulate
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.management.commands.createcachetable import (
+    Command as CreateCacheTable,
+)
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.utils.module_loading import import_string
+
+from core.cache import TwoLevelCache
+
+BENCH_TABLE = 'yatube_cache_bench'
+
+
+def build_cache(config, l1_entries):
+    backend = import_string(config['BACKEND'])(
+        config.get('LOCATION', ''), config
+    )
+    if not l1_entries:
+        return backend
+    cache = TwoLevelCache('', {'OPTIONS': {'L1_MAX_ENTRIES': l1_entries}})
+    cache.l2 = backend
+    return cache
+
+
+def run_worker(task):
+    """Один воркер: читает ключи по закону Ципфа, промахи записывает."""
+    config, l1_entries, seed, requests, keys, payload = task
+    cache = build_cache(config, l1_entries)
+    rng = random.Random(seed)
+    weights = list(accumulate(1 / rank for rank in range(1, keys + 1)))
+    stats = Counter()
+    value = 'x' * payload
+    started = time.perf_counter()
+    for key in rng.choices(range(keys), cum_weights=weights, k=requests):
+        if cache.get(f'bench:{key}') is None:
+            stats['misses'] += 1
+            cache.set(f'bench:{key}', value, 300)
+        else:
+            stats['hits'] += 1
+    stats['seconds'] = time.perf_counter() - started
+    stats['l1'] = getattr(cache, 'stats', Counter())['l1']
+    return stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает долю попаданий в кеш при нескольких процессах-воркерах '
+        'для хранилищ из CACHE_TIERS, с LRU в памяти процесса и без него.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--requests', type=int, default=20_000)
+        parser.add_argument('--keys', type=int, default=5_000)
+        parser.add_argument('--payload', type=int, default=2_048)
+        parser.add_argument('--l1', type=int, default=1_000)
+        parser.add_argument(
+            '--tiers', nargs='+', default=list(settings.CACHE_TIERS)
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        for tier in options['tiers']:
+            config = dict(settings.CACHE_TIERS[tier])
+            with self.bench_location(tier, config):
+                for l1_entries in sorted({0, options['l1']}):
+                    build_cache(config, 0).clear()
+                    self.report(
+                        tier, l1_entries, self.run(config, l1_entries, options)
+                    )
+
+    def run(self, config, l1_entries, options):
+        # Соединения с базой не должны переходить в дочерние процессы.
+        connections.close_all()
+        tasks = [
+            (config, l1_entries, options['seed'] + number,
+             options['requests'], options['keys'], options['payload'])
+            for number in range(options['workers'])
+        ]
+        context = multiprocessing.get_context('fork')
+        with context.Pool(options['workers']) as pool:
+            return pool.map(run_worker, tasks)
+
+    @contextmanager
+    def bench_location(self, tier, config):
+        """Отдельные каталог или таблица, чтобы не трогать рабочий кеш."""
+        backend = config['BACKEND']
+        if backend.endswith('FileBasedCache'):
+            config['LOCATION'] = tempfile.mkdtemp()
+            try:
+                yield
+            finally:
+                shutil.rmtree(config['LOCATION'], ignore_errors=True)
+        elif backend.endswith('DatabaseCache'):
+            config['LOCATION'] = BENCH_TABLE
+            creator = CreateCacheTable(stdout=self.stdout)
+            creator.verbosity = 0
+            creator.create_table(DEFAULT_DB_ALIAS, BENCH_TABLE, False)
+            try:
+                yield
+            finally:
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f'DROP TABLE {connection.ops.quote_name(BENCH_TABLE)}'
+                    )
+        else:
+            yield
+
+    def report(self, tier, l1_entries, results):
+        total = sum(results, Counter())
+        requests = total['hits'] + total['misses']
+        seconds = max(result['seconds'] for result in results)
+        title = f'{tier} + L1({l1_entries})' if l1_entries else tier
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        self.stdout.write(
+            f'  попадания: {total["hits"] / requests:.1%}'
+            f' (из них в L1: {total["l1"] / requests:.1%}),'
+            f' {requests / seconds:,.0f} запросов/с'
+        )
@@ -0,0 +1,158 @@
+"""
+Метрики запросов по имени view: число SQL-запросов, время в базе,
+время рендера шаблонов и попадания в кеш.
+
+Middleware заводит на время запроса счётчик в thread-local, код
+приложения добавляет в него значения через record(). Гистограммы
+копятся в памяти процесса и отдаются в текстовом формате Prometheus:
+каждый воркер отдаёт свои, суммирует их сборщик метрик.
+"""
+import hmac
+import threading
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+HISTOGRAMS = {
+    'queries': COUNT_BUCKETS,
+    'db_seconds': SECONDS_BUCKETS,
+    'template_seconds': SECONDS_BUCKETS,
+    'duration_seconds': SECONDS_BUCKETS,
+}
+# cache_hits и cache_misses — по всем кешам: tagged_cache, счётчики
+# лент, фрагменты {% cache %} из metered_cache и KV store миниатюр.
+COUNTERS = ('requests', 'cache_hits', 'cache_misses')
+
+_local = threading.local()
+_lock = threading.Lock()
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """Пары (верхняя граница, число наблюдений не больше неё)."""
+        total = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            total += count
+            yield bound, total
+
+
+class ViewMetrics:
+    def __init__(self):
+        self.histograms = {
+            name: Histogram(buckets) for name, buckets in HISTOGRAMS.items()
+        }
+        self.counters = Counter()
+
+
+views = defaultdict(ViewMetrics)
+
+
+def start():
+    """Начинает сбор метрик запроса в текущем потоке."""
+    _local.current = Counter()
+    return _local.current
+
+
+def stop():
+    _local.current = None
+
+
+def record(name, value=1):
+    """Добавляет значение к метрике текущего запроса, если он есть."""
+    current = getattr(_local, 'current', None)
+    if current is not None:
+        current[name] += value
+
+
+def observe(view_name, sample):
+    with _lock:
+        view_metrics = views[view_name]
+        for name, histogram in view_metrics.histograms.items():
+            histogram.observe(sample[name])
+        view_metrics.counters['requests'] += 1
+        for name in ('cache_hits', 'cache_misses'):
+            view_metrics.counters[name] += sample[name]
+
+
+def over_budget(view_name, sample):
+    """Метрики запроса, превысившие бюджет view из VIEW_BUDGETS."""
+    budget = settings.VIEW_BUDGETS.get(view_name, {})
+    return {
+        name: (sample[name], limit)
+        for name, limit in budget.items()
+        if sample[name] > limit
+    }
+
+
+def reset():
+    with _lock:
+        views.clear()
+
+
+def _labels(view_name, **extra):
+    labels = {'view': view_name, **extra}
+    return ','.join(f'{key}="{value}"' for key, value in labels.items())
+
+
+def exposition():
+    """Все метрики в текстовом формате Prometheus."""
+    lines = []
+    with _lock:
+        for name in HISTOGRAMS:
+            metric = f'yatube_view_{name}'
+            lines.append(f'# TYPE {metric} histogram')
+            for view_name, view_metrics in sorted(views.items()):
+                histogram = view_metrics.histograms[name]
+                for bound, count in histogram.cumulative():
+                    labels = _labels(view_name, le=bound)
+                    lines.append(f'{metric}_bucket{{{labels}}} {count}')
+                labels = _labels(view_name)
+                lines.append(f'{metric}_sum{{{labels}}} {histogram.sum:g}')
+                lines.append(f'{metric}_count{{{labels}}} {histogram.count}')
+        for name in COUNTERS:
+            lines.append(f'# TYPE yatube_view_{name}_total counter')
+            for view_name, view_metrics in sorted(views.items()):
+                labels = _labels(view_name)
+                lines.append(
+                    f'yatube_view_{name}_total{{{labels}}} '
+                    f'{view_metrics.counters[name]}'
+                )
+    return '\n'.join(lines) + '\n'
+
+
+def _has_token(request):
+    token = settings.METRICS_TOKEN
+    return bool(token) and hmac.compare_digest(
+        request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'
+    )
+
+
+def metrics_view(request):
+    """
+    Метрики для сборщика с METRICS_TOKEN или с адресов
+    METRICS_ALLOWED_IPS и для staff.
+    """
+    if not (
+        _has_token(request)
+        or request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+        or request.user.is_staff
+    ):
+        raise Http404
+    return HttpResponse(
+        exposition(), content_type='text/plain; version=0.0.4'
+    )
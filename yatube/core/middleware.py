@@ -0,0 +1,61 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsMiddleware:
+    """
+    Считает SQL-запросы, время в базе, время шаблонов и обращения к
+    кешу для каждого запроса и складывает их в гистограммы по имени
+    view. Запросы сверх бюджета из VIEW_BUDGETS пишутся в лог.
+
+    Запросы считаются через connection.execute_wrapper и работают без
+    DEBUG; сами SQL-тексты не сохраняются.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sample = metrics.start()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(self.count_query)
+                    )
+                response = self.get_response(request)
+        finally:
+            metrics.stop()
+        sample['duration_seconds'] = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            self.report(match.view_name, request, sample)
+        return response
+
+    def count_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            metrics.record('queries')
+            metrics.record('db_seconds', time.perf_counter() - started)
+
+    def report(self, view_name, request, sample):
+        metrics.observe(view_name, sample)
+        exceeded = metrics.over_budget(view_name, sample)
+        if exceeded:
+            logger.warning(
+                'Превышен бюджет %s на %s: %s', view_name, request.path,
+                ', '.join(
+                    f'{name} {value:g} > {limit:g}'
+                    for name, (value, limit) in exceeded.items()
+                ),
+            )
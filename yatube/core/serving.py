@@ -0,0 +1,238 @@
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpResponse,
+    StreamingHttpResponse,
+)
+from django.utils._os import safe_join
+from django.utils.cache import (
+    get_conditional_response,
+    patch_cache_control,
+    patch_vary_headers,
+)
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.views.decorators.http import require_safe
+
+from .storage import PRECOMPRESSED, is_hashed_name
+
+CHUNK_SIZE = 64 * 2 ** 10
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+@lru_cache(maxsize=4096)
+def _file_hash(path, mtime_ns, size):
+    # mtime и размер входят в ключ: изменённый файл хешируется заново.
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:32]
+
+
+def file_etag(name, path, stat):
+    """
+    Сильный ETag по содержимому. Картинки постов и миниатюры sorl
+    уже названы хешем, для остальных файлов хеш считается один раз
+    на версию файла.
+    """
+    if is_hashed_name(name):
+        return quote_etag(posixpath.splitext(posixpath.basename(name))[0])
+    return quote_etag(_file_hash(path, stat.st_mtime_ns, stat.st_size))
+
+
+def parse_range(header, size):
+    """
+    Диапазон (начало, конец включительно) из заголовка Range.
+
+    None — отдать файл целиком (заголовка нет или диапазонов
+    несколько), ValueError — диапазон за пределами файла.
+    """
+    match = RANGE.match(header or '')
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        length = int(end)
+        if not length:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def _if_range_matches(request, etag, last_modified):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+def accepted_encodings(header):
+    """Кодировки из Accept-Encoding, кроме запрещённых через q=0."""
+    accepted = set()
+    for item in (header or '').split(','):
+        token, _, params = item.strip().partition(';')
+        quality = params.strip().partition('=')[2]
+        try:
+            if quality and float(quality) == 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(token.strip().lower())
+    return accepted
+
+
+def _precompressed(request, path, encodings):
+    """Сжатый заранее вариант файла, который примет клиент."""
+    accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING'))
+    for encoding, suffix in encodings:
+        if encoding in accepted and os.path.isfile(path + suffix):
+            return encoding, suffix
+    return None, ''
+
+
+def _sendfile_response(name, path, accel_prefix):
+    mode = settings.SENDFILE_MODE
+    response = HttpResponse()
+    if mode == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = accel_prefix + name
+    elif mode == 'x-sendfile':
+        response['X-Sendfile'] = path
+    else:
+        raise ValueError(f'Неизвестный SENDFILE_MODE: {mode}')
+    # Диапазоны и длину веб-сервер считает по самому файлу.
+    return response
+
+
+def serve_file(request, name, document_root, immutable=False,
+               encodings=(), accel_prefix=''):
+    """
+    Отдаёт файл из document_root с ETag, Last-Modified и Cache-Control.
+
+    Отвечает 304 на If-None-Match и If-Modified-Since, 206 на Range.
+    encodings — пары (кодировка, суффикс) сжатых заранее копий в
+    порядке предпочтения: подходящая по Accept-Encoding отдаётся
+    вместо исходного файла. Если задан SENDFILE_MODE, тело отдаёт
+    веб-сервер по заголовку X-Accel-Redirect (путь с accel_prefix)
+    или X-Sendfile, а Django проверяет только условные заголовки.
+    """
+    name = posixpath.normpath(name).lstrip('/')
+    try:
+        path = safe_join(document_root, name)
+    except SuspiciousFileOperation:
+        raise Http404(name)
+    if not os.path.isfile(path):
+        raise Http404(name)
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    encoding, suffix = _precompressed(request, path, encodings)
+    stat = os.stat(path + suffix)
+    etag = file_etag(name + suffix, path + suffix, stat)
+    last_modified = int(stat.st_mtime)
+
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        if settings.SENDFILE_MODE:
+            response = _sendfile_response(
+                name + suffix, path + suffix, accel_prefix
+            )
+        else:
+            response = _content_response(
+                request, path + suffix, stat.st_size,
+                _if_range_matches(request, etag, last_modified),
+            )
+        if response.status_code != 416:
+            response['Content-Type'] = content_type
+        if encoding:
+            response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    if encodings:
+        patch_vary_headers(response, ('Accept-Encoding',))
+    if immutable:
+        patch_cache_control(
+            response, public=True, immutable=True,
+            max_age=settings.IMMUTABLE_MAX_AGE,
+        )
+    else:
+        patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+def _content_response(request, path, size, ranged):
+    try:
+        byte_range = ranged and parse_range(
+            request.META.get('HTTP_RANGE'), size
+        )
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    if not byte_range:
+        response = FileResponse(open(path, 'rb'))
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _read_range(path, start, end - start + 1), status=206
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Файлы MEDIA_ROOT. Картинки постов и миниатюры названы хешем
+    содержимого и кешируются браузером навсегда.
+    """
+    return serve_file(
+        request, path, settings.MEDIA_ROOT,
+        immutable=is_hashed_name(path),
+        accel_prefix=settings.MEDIA_ACCEL_REDIRECT_PREFIX,
+    )
+
+
+@require_safe
+def serve_static(request, path):
+    """
+    Файлы STATIC_ROOT после collectstatic. Имена из манифеста
+    содержат хеш и кешируются навсегда, сжатые копии выбираются
+    по Accept-Encoding.
+    """
+    return serve_file(
+        request, path, settings.STATIC_ROOT,
+        immutable=staticfiles_storage.is_hashed(path),
+        encodings=PRECOMPRESSED,
+        accel_prefix=settings.STATIC_ACCEL_REDIRECT_PREFIX,
+    )
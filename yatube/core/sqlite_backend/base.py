@@ -0,0 +1,66 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+# Значения по умолчанию; OPTIONS['pragmas'] в DATABASES переопределяет
+# их, None отключает прагму.
+PRAGMAS = {
+    # Читатели не ждут писателя, а писатель — читателей.
+    'journal_mode': 'WAL',
+    # В WAL коммит не ждёт fsync, данные не теряются при падении
+    # процесса, только при отключении питания.
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 2 ** 20,
+    # Отрицательное значение — в килобайтах.
+    'cache_size': -64 * 2 ** 10,
+    # Миллисекунды ожидания блокировки до «database is locked».
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite с прагмами из PRAGMAS на каждом новом соединении.
+
+    transaction.atomic открывает транзакцию BEGIN transaction_mode,
+    по умолчанию DEFERRED: читающие блоки не берут блокировку записи.
+    core.transactions.write_atomic открывает её BEGIN
+    write_transaction_mode, по умолчанию IMMEDIATE: при обычном BEGIN
+    транзакция, начавшая с чтения, не может стать пишущей, пока пишет
+    другое соединение, и сразу падает с «database is locked», не
+    дожидаясь busy_timeout.
+    """
+    # Режим для следующего BEGIN, его ставит write_atomic.
+    begin_mode = None
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = {**PRAGMAS, **params.pop('pragmas', {})}
+        self.transaction_mode = self._mode(
+            params, 'transaction_mode', 'DEFERRED'
+        )
+        self.write_transaction_mode = self._mode(
+            params, 'write_transaction_mode', 'IMMEDIATE'
+        )
+        return params
+
+    @staticmethod
+    def _mode(params, option, default):
+        mode = params.pop(option, default).upper()
+        if mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f'{option} должен быть одним из {TRANSACTION_MODES}.'
+            )
+        return mode
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            if value is not None:
+                conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.begin_mode or self.transaction_mode
+        self.cursor().execute(f'BEGIN {mode}')
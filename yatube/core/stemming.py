@@ -0,0 +1,138 @@
+"""
+Стеммер русского языка по алгоритму Snowball (Портера).
+
+Окончания ищутся в области RV — после первой гласной, словообразовательный
+суффикс -ост(ь) — в области R2. Латиница и числа возвращаются как есть,
+в нижнем регистре.
+"""
+import re
+
+VOWELS = 'аеиоуыэюя'
+WORD = re.compile(r'[0-9a-zа-яё]+')
+CYRILLIC = re.compile(r'[а-я]')
+
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+REFLEXIVE = ((), ('ся', 'сь'))
+ADJECTIVE = ((), (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+))
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет',
+     'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+     'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+     'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+NOUN = ((), (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и',
+    'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о',
+    'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я',
+))
+DERIVATIONAL = ('ост', 'ость')
+SUPERLATIVE = ('ейш', 'ейше')
+
+
+def _regions(word):
+    """Начала областей RV и R2."""
+    rv = r1 = r2 = len(word)
+    for index, letter in enumerate(word):
+        if letter in VOWELS:
+            rv = index + 1
+            break
+    for index in range(1, len(word)):
+        if word[index - 1] in VOWELS and word[index] not in VOWELS:
+            r1 = index + 1
+            break
+    for index in range(r1 + 1, len(word)):
+        if word[index - 1] in VOWELS and word[index] not in VOWELS:
+            r2 = index + 1
+            break
+    return rv, r2
+
+
+def _strip(word, start, groups):
+    """
+    Слово без самого длинного окончания из groups, лежащего целиком
+    в области от start, или None. Окончания первой группы
+    отрезаются, только если перед ними а или я из той же области.
+    """
+    preceded, plain = groups
+    found = None
+    for ending in preceded + plain:
+        if (
+            word.endswith(ending)
+            and len(word) - len(ending) >= start
+            and (found is None or len(ending) > len(found))
+        ):
+            found = ending
+    if found is None:
+        return None
+    stem = word[:-len(found)]
+    if found in preceded and found not in plain:
+        if len(stem) <= start or stem[-1] not in 'ая':
+            return None
+    return stem
+
+
+def _adjectival(word, rv):
+    stem = _strip(word, rv, ADJECTIVE)
+    if stem is None:
+        return None
+    return _strip(stem, rv, PARTICIPLE) or stem
+
+
+def _inflection(word, rv):
+    """Шаг 1: деепричастие или возвратная частица и окончание."""
+    stripped = _strip(word, rv, PERFECTIVE_GERUND)
+    if stripped is not None:
+        return stripped
+    word = _strip(word, rv, REFLEXIVE) or word
+    for stripped in (
+        _adjectival(word, rv),
+        _strip(word, rv, VERB),
+        _strip(word, rv, NOUN),
+    ):
+        if stripped is not None:
+            return stripped
+    return word
+
+
+def _tidy_up(word, rv):
+    """Шаг 4: превосходная степень, двойное н и мягкий знак."""
+    stripped = _strip(word, rv, ((), SUPERLATIVE + ('н', 'ь')))
+    if stripped is None:
+        return word
+    removed = word[len(stripped):]
+    if removed == 'ь':
+        return stripped
+    if removed == 'н':
+        return stripped if stripped.endswith('н') else word
+    if stripped.endswith('нн') and len(stripped) - 2 >= rv:
+        return stripped[:-1]
+    return stripped
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    if not CYRILLIC.search(word):
+        return word
+    rv, r2 = _regions(word)
+    word = _inflection(word, rv)
+    if word.endswith('и') and len(word) > rv:
+        word = word[:-1]
+    word = _strip(word, r2, ((), DERIVATIONAL)) or word
+    return _tidy_up(word, rv)
+
+
+def words(text):
+    """Слова текста в нижнем регистре, в порядке появления."""
+    return WORD.findall(text.lower())
@@ -0,0 +1,120 @@
+import gzip
+import hashlib
+import os
+import posixpath
+import re
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+from django.utils.functional import cached_property
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+HASH_LENGTH = 32
+HASHED_NAME = re.compile(rf'^[0-9a-f]{{{HASH_LENGTH}}}(\.[0-9a-z]+)?$')
+
+# Сжатые заранее копии статики в порядке предпочтения.
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+COMPRESSIBLE = ('.css', '.js', '.svg', '.txt', '.json', '.map', '.ico')
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def is_hashed_name(name):
+    return bool(HASHED_NAME.match(posixpath.basename(name)))
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Файловое хранилище, называющее файлы по хешу содержимого.
+
+    Каталог из upload_to сохраняется, имя файла заменяется на
+    sha256 содержимого с исходным расширением. Одинаковые загрузки
+    получают одно имя и хранятся один раз, а вместе с именем у них
+    общие и миниатюры sorl.
+    """
+
+    def hashed_name(self, name, digest):
+        directory, filename = posixpath.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return posixpath.join(directory, f'{digest}{extension}')
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content_hash(content))
+        if self.exists(name):
+            # Свежее mtime защищает файл от gc_media: картинка могла
+            # быть брошенной, а теперь на неё сошлётся новый пост.
+            os.utime(self.path(name))
+            return name
+        # При гонке двух одинаковых загрузок FileSystemStorage сам
+        # подберёт свободное имя: лишняя копия лучше ошибки.
+        return self._save(name, content)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Статика с хешем в именах и сжатыми копиями.
+
+    После collectstatic рядом с текстовыми файлами лежат .gz и, если
+    установлен brotli, .br, если они меньше исходника. Файлы, которых
+    нет в манифесте (collectstatic ещё не запускался), отдаются по
+    исходному имени вместо ошибки.
+    """
+
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    @cached_property
+    def _hashed_names(self):
+        return set(self.hashed_files.values())
+
+    def is_hashed(self, name):
+        return name in self._hashed_names
+
+    def post_process(self, paths, dry_run=False, **options):
+        names = set()
+        for name, hashed_name, processed in super().post_process(
+            paths, dry_run, **options
+        ):
+            names.add(name)
+            if isinstance(hashed_name, str):
+                names.add(hashed_name)
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        self.__dict__.pop('_hashed_names', None)
+        for name in sorted(names):
+            if name.endswith(COMPRESSIBLE):
+                self.compress(name)
+
+    def compress(self, name):
+        path = self.path(name)
+        with open(path, 'rb') as file:
+            content = file.read()
+        variants = {'.gz': gzip.compress(content, 9, mtime=0)}
+        if brotli is not None:
+            variants['.br'] = brotli.compress(content)
+        for suffix, compressed in variants.items():
+            if len(compressed) < len(content):
+                with open(path + suffix, 'wb') as file:
+                    file.write(compressed)
@@ -0,0 +1,113 @@
+import hashlib
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import quote_etag
+
+from . import metrics
+
+# Попадания и промахи в этом процессе, для метрик.
+stats = Counter()
+
+
+def _tag_key(tag):
+    return f'tag:{tag}'
+
+
+def _new_version():
+    # Время смены в начале версии: по нему считается Last-Modified.
+    return f'{time.time():.6f}:{uuid.uuid4().hex}'
+
+
+def _changed_at(version):
+    stamp, _, _ = version.partition(':')
+    try:
+        return float(stamp)
+    except ValueError:
+        # Версия без времени: когда она сменилась, неизвестно.
+        return time.time()
+
+
+def tag_versions(tags):
+    """Текущие версии тегов; отсутствующие в кеше заводятся заново."""
+    keys = [_tag_key(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    missing = {key: _new_version() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def version(*tags):
+    """Общая версия тегов для ключа фрагмента шаблона."""
+    return '.'.join(tag_versions(tags))
+
+
+def etag(*tags, key=''):
+    """
+    ETag ответа, собранного из данных с этими тегами: меняется со
+    сменой версии любого тега. key различает варианты ответа
+    (курсор, пользователь).
+    """
+    raw = f'{version(*tags)}:{key}'
+    return quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+
+def changed_at(*tags):
+    """
+    Время последней смены версии любого из тегов. Заведённая заново
+    версия (после вытеснения из кеша) считается сменой.
+    """
+    return datetime.fromtimestamp(
+        max(map(_changed_at, tag_versions(tags))), timezone.utc
+    )
+
+
+def get_or_set(key, default, tags, timeout=None):
+    """
+    Значение из кеша, если с момента записи не сменилась версия
+    ни одного из его тегов, иначе — вычисленное заново.
+
+    Версии берутся до вычисления: если теги сбросят, пока значение
+    считается, оно запишется уже устаревшим и не будет прочитано.
+    """
+    tag_keys = [_tag_key(tag) for tag in tags]
+    found = cache.get_many([key, *tag_keys])
+    versions = [found.get(tag_key) for tag_key in tag_keys]
+    entry = found.get(key)
+    if entry is not None and entry[0] == versions:
+        stats['hits'] += 1
+        metrics.record('cache_hits')
+        return entry[1]
+    stats['misses'] += 1
+    metrics.record('cache_misses')
+    if None in versions:
+        versions = tag_versions(tags)
+    value = default() if callable(default) else default
+    if timeout is None:
+        timeout = settings.TAGGED_CACHE_TIMEOUT
+    cache.set(key, (versions, value), timeout)
+    return value
+
+
+def _bump(tags):
+    cache.set_many({_tag_key(tag): _new_version() for tag in tags}, None)
+
+
+def invalidate(*tags):
+    """
+    Сбрасывает всё, что закешировано с любым из тегов.
+
+    Версии меняются сразу и ещё раз после коммита: читатель, который
+    до коммита собрал значение из старых строк, записал его под
+    промежуточной версией, и оно не будет прочитано.
+    """
+    if tags:
+        _bump(tags)
+        transaction.on_commit(lambda: _bump(tags))
@@ -0,0 +1,44 @@
+from django import template
+from django.templatetags.cache import CacheNode, do_cache
+
+from core import metrics
+
+register = template.Library()
+
+
+class MissNode(template.Node):
+    """Тело фрагмента: рендерится, только когда его нет в кеше."""
+
+    child_nodelists = ('nodelist',)
+
+    def __init__(self, nodelist):
+        self.nodelist = nodelist
+
+    def render(self, context):
+        context.render_context[self] = True
+        return self.nodelist.render(context)
+
+
+class MeteredCacheNode(CacheNode):
+    """{% cache %}, который пишет попадания и промахи в метрики."""
+
+    def render(self, context):
+        miss_node = self.nodelist[0]
+        context.render_context[miss_node] = False
+        value = super().render(context)
+        metrics.record(
+            'cache_misses' if context.render_context[miss_node]
+            else 'cache_hits'
+        )
+        return value
+
+
+@register.tag('cache')
+def do_metered_cache(parser, token):
+    """Тот же {% cache %}, что в django.templatetags.cache, с метриками."""
+    node = do_cache(parser, token)
+    return MeteredCacheNode(
+        template.NodeList([MissNode(node.nodelist)]),
+        node.expire_time_var, node.fragment_name, node.vary_on,
+        node.cache_name,
+    )
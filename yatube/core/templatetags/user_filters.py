@@ -5,3 +5,22 @@ register = template.Library()
 @register.filter
 def addclass(field, css):
     return field.as_widget(attrs={'class': css})
+
+
+@register.filter
+def page_window(page_obj, on_each_side=2):
+    """Номера страниц вокруг текущей и по краям; None — пропуск."""
+    last = page_obj.paginator.num_pages
+    numbers = {1, last}
+    numbers.update(range(
+        max(page_obj.number - on_each_side, 1),
+        min(page_obj.number + on_each_side, last) + 1,
+    ))
+    window = []
+    previous = 0
+    for number in sorted(numbers):
+        if number - previous > 1:
+            window.append(None)
+        window.append(number)
+        previous = number
+    return window
@@ -0,0 +1,31 @@
+from contextlib import contextmanager
+
+from django.db import transaction
+
+
+@contextmanager
+def write_atomic(using=None):
+    """
+    transaction.atomic для блоков, которые пишут в базу. На
+    core.sqlite_backend внешняя транзакция открывается BEGIN
+    write_transaction_mode (IMMEDIATE) и ждёт блокировку записи сразу,
+    а не падает на первой записи. Вложенный блок — обычный atomic.
+    """
+    connection = transaction.get_connection(using)
+    # Режимы читаются из OPTIONS при подключении.
+    connection.ensure_connection()
+    outermost = (
+        hasattr(connection, 'write_transaction_mode')
+        and not connection.in_atomic_block
+    )
+    if outermost:
+        connection.begin_mode = connection.write_transaction_mode
+    try:
+        with transaction.atomic(using=using):
+            # BEGIN уже выполнен при входе в atomic.
+            if outermost:
+                connection.begin_mode = None
+            yield
+    finally:
+        if outermost:
+            connection.begin_mode = None
@@ -0,0 +1,194 @@
+import hashlib
+from datetime import timedelta
+
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from django.views.decorators.http import condition, require_safe
+
+from core import tagged_cache
+
+from . import cache_tags, counters
+from .feeds import feed_posts, follow_feed
+from .models import Group, Post, UserStats
+from .utils import QUANTUTY_POST_ON_PAGE, CursorPaginator
+from .views import PROFILE_AUTHORS, comments_page, page_object_or_404
+
+JSON_PARAMS = {'ensure_ascii': False, 'separators': (',', ':')}
+
+
+def post_data(post):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date,
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'image': post.image.url if post.image else None,
+    }
+
+
+def author_stats(author):
+    """
+    Счётчики автора. У пользователей, созданных через bulk_create,
+    строки UserStats нет: тогда они считаются по базе.
+    """
+    stats = getattr(author, 'stats', None)
+    if stats is not None:
+        return stats
+    actual = counters.actual_user_stats().get(pk=author.pk)
+    return UserStats(
+        user=author,
+        posts_count=actual.actual_posts,
+        followers_count=actual.actual_followers,
+        following_count=actual.actual_following,
+    )
+
+
+def comment_data(comment):
+    return {
+        'id': comment.pk,
+        'author': comment.author.username,
+        'text': comment.text,
+        'created': comment.created,
+    }
+
+
+def page_data(page, serialize):
+    return {
+        'results': [serialize(obj) for obj in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    }
+
+
+def feed_page(request, posts):
+    paginator = CursorPaginator(posts, QUANTUTY_POST_ON_PAGE)
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+def conditional(tags_func):
+    """
+    condition() по версиям тегов кеша: ETag из версий и курсора,
+    Last-Modified — время последней смены версии. Пока лента не
+    менялась, 304 отдаётся без запросов к постам. Удаление поста тоже
+    сбрасывает его теги, поэтому сдвигает Last-Modified.
+    """
+    def etag_func(request, *args, **kwargs):
+        return tagged_cache.etag(
+            *tags_func(request, *args, **kwargs),
+            key=request.GET.get('cursor', ''),
+        )
+
+    def last_modified_func(request, *args, **kwargs):
+        changed = tagged_cache.changed_at(*tags_func(request, *args, **kwargs))
+        # Last-Modified точен до секунды: смену в ту же секунду после
+        # ответа клиент с одним If-Modified-Since не заметил бы.
+        if timezone.now() - changed < timedelta(seconds=1):
+            return None
+        return changed
+
+    return condition(
+        etag_func=etag_func, last_modified_func=last_modified_func
+    )
+
+
+def json_response(data):
+    """Компактный JSON, который клиент должен перепроверять."""
+    response = JsonResponse(data, json_dumps_params=JSON_PARAMS)
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def index_tags(request):
+    return [cache_tags.INDEX]
+
+
+def group_tags(request, slug):
+    group = page_object_or_404(request, Group.objects.all(), slug=slug)
+    return [cache_tags.group(group.id)]
+
+
+def profile_tags(request, username):
+    author = page_object_or_404(request, PROFILE_AUTHORS, username=username)
+    return [cache_tags.author(author.id)]
+
+
+def post_tags(request, post_id):
+    return [cache_tags.post(post_id)]
+
+
+@require_safe
+@conditional(index_tags)
+def index(request):
+    page = feed_page(request, feed_posts())
+    return json_response(page_data(page, post_data))
+
+
+@require_safe
+@conditional(group_tags)
+def group_posts(request, slug):
+    group = page_object_or_404(request, Group.objects.all(), slug=slug)
+    page = feed_page(request, feed_posts(group=group))
+    return json_response({
+        'group': {
+            'slug': group.slug,
+            'title': group.title,
+            'description': group.description,
+        },
+        **page_data(page, post_data),
+    })
+
+
+@require_safe
+@conditional(profile_tags)
+def profile(request, username):
+    author = page_object_or_404(request, PROFILE_AUTHORS, username=username)
+    page = feed_page(request, feed_posts(author=author))
+    stats = author_stats(author)
+    return json_response({
+        'author': {
+            'username': author.username,
+            'full_name': author.get_full_name(),
+            'posts_count': stats.posts_count,
+            'followers_count': stats.followers_count,
+            'following_count': stats.following_count,
+        },
+        **page_data(page, post_data),
+    })
+
+
+@require_safe
+def follow_index(request):
+    """
+    Лента подписок зависит от постов всех авторов, на которых подписан
+    пользователь, поэтому у неё только ETag по содержимому ответа.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse(
+            {'detail': 'Нужно войти.'}, status=401,
+            json_dumps_params=JSON_PARAMS,
+        )
+    page = feed_page(request, follow_feed(request.user))
+    response = json_response(page_data(page, post_data))
+    etag = quote_etag(hashlib.md5(response.content).hexdigest())
+    response['ETag'] = etag
+    return get_conditional_response(request, etag=etag, response=response)
+
+
+@require_safe
+@conditional(post_tags)
+def post_detail(request, post_id):
+    """Пост и страница его комментариев по курсору ?cursor=."""
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), id=post_id
+    )
+    comments = comments_page(post.id, request.GET.get('cursor'))
+    return json_response({
+        **post_data(post),
+        'updated': post.updated,
+        'comments_count': post.comments_count,
+        'comments': page_data(comments, comment_data),
+    })
@@ -0,0 +1,23 @@
+"""Теги, которыми помечаются закешированные ленты и фрагменты."""
+
+INDEX = 'posts'
+
+
+def group(group_id):
+    return f'group:{group_id}'
+
+
+def author(author_id):
+    return f'author:{author_id}'
+
+
+def post(post_id):
+    return f'post:{post_id}'
+
+
+def post_tags(post_obj):
+    """Теги самого поста и всех общих лент, где он показывается."""
+    tags = [INDEX, post(post_obj.pk), author(post_obj.author_id)]
+    if post_obj.group_id:
+        tags.append(group(post_obj.group_id))
+    return tags
@@ -0,0 +1,199 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from core import metrics, tagged_cache
+
+from .models import Comment, Follow, Post, User, UserStats
+
+
+def index_key():
+    return 'feed_count:index'
+
+
+def group_key(group_id):
+    return f'feed_count:group:{group_id}'
+
+
+def author_key(author_id):
+    return f'feed_count:author:{author_id}'
+
+
+def follow_key(user_id):
+    return f'feed_count:follow:{user_id}'
+
+
+def feed_count(key, queryset, tags=None):
+    """
+    Число постов в ленте: из кеша, а при промахе — одним COUNT.
+
+    Счётчик с tags пересчитывается и со сменой версии любого из них:
+    так считается лента подписок, в которую посты популярных авторов
+    подмешиваются при чтении, мимо _forget_followers.
+    """
+    if tags is not None:
+        return tagged_cache.get_or_set(
+            key, queryset.count, tags, settings.FEED_COUNT_TIMEOUT
+        )
+    count = cache.get(key)
+    if count is None:
+        metrics.record('cache_misses')
+        count = queryset.count()
+        cache.set(key, count, settings.FEED_COUNT_TIMEOUT)
+    else:
+        metrics.record('cache_hits')
+    return count
+
+
+def _shift(keys, delta):
+    for key in keys:
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            pass
+
+
+def _forget_followers(author_id):
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)[:settings.FEED_FANOUT_LIMIT]
+    cache.delete_many([follow_key(user_id) for user_id in followers])
+
+
+def forget_feeds(user_ids, group_ids):
+    """
+    Сбрасывает счётчики лент после вставки в обход сигналов: общей,
+    групп, авторов и подписок этих пользователей.
+    """
+    cache.delete_many([
+        index_key(),
+        *map(group_key, group_ids),
+        *map(author_key, user_ids),
+        *map(follow_key, user_ids),
+    ])
+
+
+def post_added(post):
+    """Учитывает новый пост во всех лентах, где он появится."""
+    keys = [index_key(), author_key(post.author_id)]
+    if post.group_id:
+        keys.append(group_key(post.group_id))
+    _shift(keys, 1)
+    _forget_followers(post.author_id)
+
+
+def post_removed(post):
+    """Убирает удалённый пост из счётчиков лент."""
+    keys = [index_key(), author_key(post.author_id)]
+    if post.group_id:
+        keys.append(group_key(post.group_id))
+    _shift(keys, -1)
+    _forget_followers(post.author_id)
+
+
+def post_regrouped(old_group_id, new_group_id):
+    """Переносит пост между счётчиками групп при смене группы."""
+    if old_group_id:
+        _shift([group_key(old_group_id)], -1)
+    if new_group_id:
+        _shift([group_key(new_group_id)], 1)
+
+
+def follow_changed(user_id):
+    cache.delete(follow_key(user_id))
+
+
+def related_count(model, field):
+    """Подзапрос с числом строк model, ссылающихся на текущую запись."""
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            total=Count('pk')
+        ).values('total'),
+        output_field=IntegerField(),
+    ), 0)
+
+
+def actual_user_stats():
+    return User.objects.annotate(
+        actual_posts=related_count(Post, 'author'),
+        actual_followers=related_count(Follow, 'author'),
+        actual_following=related_count(Follow, 'user'),
+    )
+
+
+def shift_user_stats(user_id, **deltas):
+    """Сдвигает счётчики пользователя атомарным UPDATE."""
+    updated = UserStats.objects.filter(
+        user_id=user_id,
+        **{
+            f'{field}__gte': -delta
+            for field, delta in deltas.items() if delta < 0
+        },
+    ).update(**{field: F(field) + delta for field, delta in deltas.items()})
+    if not updated and min(deltas.values()) >= 0:
+        user = actual_user_stats().get(pk=user_id)
+        UserStats.objects.get_or_create(
+            user_id=user_id,
+            defaults={
+                'posts_count': user.actual_posts,
+                'followers_count': user.actual_followers,
+                'following_count': user.actual_following,
+            },
+        )
+
+
+def shift_comments_count(post_id, delta):
+    Post.objects.filter(pk=post_id, comments_count__gte=-delta).update(
+        comments_count=F('comments_count') + delta
+    )
+
+
+def reconcile_comments_counts(batch_size=1000):
+    """Исправляет разошедшиеся счётчики комментариев, возвращает их число."""
+    drifted = [
+        Post(pk=pk, comments_count=actual)
+        for pk, actual in Post.objects.annotate(
+            actual=related_count(Comment, 'post')
+        ).exclude(comments_count=F('actual')).values_list('pk', 'actual')
+    ]
+    Post.objects.bulk_update(drifted, ['comments_count'], batch_size)
+    return len(drifted)
+
+
+def reconcile_user_stats(batch_size=1000):
+    """Создаёт недостающие и исправляет разошедшиеся счётчики пользователей."""
+    UserStats.objects.bulk_create(
+        [
+            UserStats(user_id=pk)
+            for pk in User.objects.filter(
+                stats__isnull=True
+            ).values_list('pk', flat=True)
+        ],
+        # Django 2.2 не ограничивает batch_size в bulk_create лимитом
+        # SQLite на составной SELECT, поэтому размер пачки выбирает он сам.
+        ignore_conflicts=True,
+    )
+    drifted = [
+        UserStats(
+            user_id=pk,
+            posts_count=posts,
+            followers_count=followers,
+            following_count=following,
+        )
+        for pk, posts, followers, following in actual_user_stats().exclude(
+            stats__posts_count=F('actual_posts'),
+            stats__followers_count=F('actual_followers'),
+            stats__following_count=F('actual_following'),
+        ).values_list(
+            'pk', 'actual_posts', 'actual_followers', 'actual_following'
+        )
+    ]
+    UserStats.objects.bulk_update(
+        drifted,
+        ['posts_count', 'followers_count', 'following_count'],
+        batch_size,
+    )
+    return len(drifted)
@@ -0,0 +1,169 @@
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Q
+
+from core import tagged_cache
+
+from . import cache_tags
+from .models import Follow, Post, Timeline, UserStats
+
+FEED_POST_FIELDS = (
+    'text',
+    'pub_date',
+    'updated',
+    'image',
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+    'group__title',
+    'group__slug',
+)
+
+
+def feed_posts(*args, **kwargs):
+    """Посты для лент: автор и группа одним JOIN, только нужные колонки."""
+    return Post.objects.filter(*args, **kwargs).select_related(
+        'author', 'group'
+    ).only(*FEED_POST_FIELDS)
+
+
+def cached_page_posts(page_obj, feed_key, tags):
+    """
+    Посты страницы по закешированному списку id.
+
+    Сами посты берутся из базы по первичному ключу, поэтому правка
+    текста видна сразу; состав страницы меняется только со сменой
+    версии тегов ленты.
+    """
+    posts = None
+
+    def page_ids():
+        nonlocal posts
+        posts = list(page_obj.object_list)
+        return [post.pk for post in posts]
+
+    ids = tagged_cache.get_or_set(
+        f'feed_page:{feed_key}:{page_obj.number}', page_ids, tags
+    )
+    if posts is not None:
+        return posts
+    posts = feed_posts().in_bulk(ids)
+    return [posts[pk] for pk in ids if pk in posts]
+
+
+def attach_card_versions(posts):
+    """
+    Проставляет постам card_version для ключа фрагмента карточки:
+    версии тегов автора и группы, одним запросом к кешу на страницу.
+    Так карточка перестраивается, когда меняют имя автора или группу.
+    """
+    post_tags = {
+        post.pk: [cache_tags.author(post.author_id)] + (
+            [cache_tags.group(post.group_id)] if post.group_id else []
+        )
+        for post in posts
+    }
+    tags = sorted({tag for tags in post_tags.values() for tag in tags})
+    versions = dict(zip(tags, tagged_cache.tag_versions(tags)))
+    for post in posts:
+        post.card_version = '.'.join(
+            versions[tag] for tag in post_tags[post.pk]
+        )
+
+
+def fanout_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    limit = settings.FEED_FANOUT_LIMIT
+    followers = list(
+        Follow.objects.filter(
+            author_id=post.author_id
+        ).values_list('user_id', flat=True)[:limit + 1]
+    )
+    if len(followers) > limit:
+        return
+    Timeline.objects.bulk_create(
+        [
+            Timeline(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in followers
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def backfill_timeline(user_id, author_id):
+    """Добавляет в ленту читателя последние посты нового автора."""
+    if author_id in fanout_on_read_authors(user_id):
+        return
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('id', 'pub_date')[:settings.FEED_BACKFILL_SIZE]
+    Timeline.objects.bulk_create(
+        [
+            Timeline(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in posts
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def resume_fanout(author_id, batch_size=10000):
+    """
+    Если после отписки у автора снова не больше FEED_FANOUT_LIMIT
+    подписчиков, его посты опять раскладываются по лентам, а не
+    читаются при запросе. Вышедшие за это время посты докладываются
+    подписчикам, иначе они пропали бы из их лент.
+    """
+    if not UserStats.objects.filter(
+        user_id=author_id, followers_count=settings.FEED_FANOUT_LIMIT
+    ).exists():
+        return
+    posts = list(Post.objects.filter(
+        author_id=author_id
+    ).values_list('id', 'pub_date')[:settings.FEED_BACKFILL_SIZE])
+    entries = (
+        Timeline(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for user_id in Follow.objects.filter(
+            author_id=author_id
+        ).values_list('user_id', flat=True).iterator()
+        for post_id, pub_date in posts
+    )
+    while True:
+        batch = list(islice(entries, batch_size))
+        if not batch:
+            return
+        Timeline.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def trim_timeline(user_id, author_id):
+    """Убирает из ленты читателя посты автора, от которого он отписался."""
+    Timeline.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def fanout_on_read_authors(user_id):
+    """Авторы из подписок, чьи посты не раскладываются по лентам."""
+    return set(
+        Follow.objects.filter(
+            user_id=user_id,
+            author__stats__followers_count__gt=settings.FEED_FANOUT_LIMIT,
+        ).values_list('author_id', flat=True)
+    )
+
+
+def follow_feed(user, authors=None):
+    """
+    Посты авторов, на которых подписан пользователь. authors — уже
+    полученные fanout_on_read_authors(user.id).
+    """
+    if authors is None:
+        authors = fanout_on_read_authors(user.id)
+    if not authors:
+        return feed_posts(
+            timeline_entries__user=user
+        ).order_by('-timeline_entries__pub_date')
+    return feed_posts(
+        Q(id__in=Timeline.objects.filter(user=user).values('post_id'))
+        | Q(author_id__in=authors)
+    )
@@ -1,5 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 from .models import Post, Comment
+from . import images
 
 
 class PostForm(forms.ModelForm):
@@ -7,6 +9,28 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('group', 'text', 'image')
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Слишком большой файл убираем до того, как его откроет Pillow
+        # в ImageField.to_python, а ошибку показываем в clean_image.
+        self.image_error = None
+        upload = self.files.get('image')
+        if upload is not None:
+            try:
+                images.check_size(upload)
+            except forms.ValidationError as error:
+                self.image_error = error
+                self.files = self.files.copy()
+                del self.files['image']
+
+    def clean_image(self):
+        if self.image_error:
+            raise self.image_error
+        image = self.cleaned_data['image']
+        if isinstance(image, UploadedFile):
+            return images.sanitize(image)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,93 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from PIL import Image, ImageOps
+
+# Форматы, которые понимают миниатюры; остальные не принимаются.
+ALLOWED_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+
+
+def check_size(upload):
+    """Отсекает слишком большой файл ещё до разбора картинки."""
+    limit = settings.POST_IMAGE_MAX_BYTES
+    if upload.size > limit:
+        raise ValidationError(
+            f'Файл больше {limit // 2 ** 20} МБ.', code='file_too_large'
+        )
+
+
+def _check_pixels(image):
+    # Размер и число кадров берутся из заголовков, до декодирования.
+    width, height = image.size
+    frames = getattr(image, 'n_frames', 1)
+    if width * height * frames > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Слишком большое изображение: уменьшите размер или число кадров.',
+            code='too_many_pixels',
+        )
+
+
+def _save_animation(image, output):
+    # Pillow перекодирует GIF покадрово; из метаданных остаются только
+    # тайминги и повтор, комментарии и расширения отбрасываются.
+    options = {
+        key: image.info[key]
+        for key in ('duration', 'loop', 'disposal', 'transparency')
+        if key in image.info
+    }
+    image.info.clear()
+    image.save(output, image.format, save_all=True, **options)
+
+
+def _save_still(image, output):
+    image_format = image.format
+    # Поворот из EXIF применяем до того, как выбросим сам EXIF.
+    image = ImageOps.exif_transpose(image)
+    options = {'optimize': True}
+    if image_format in ('JPEG', 'WEBP'):
+        options['quality'] = settings.POST_IMAGE_QUALITY
+    if image_format == 'GIF' and 'transparency' in image.info:
+        options['transparency'] = image.info['transparency']
+    image.info.clear()
+    image.save(output, image_format, **options)
+
+
+def sanitize(upload):
+    """
+    Проверяет размеры картинки и перекодирует её без метаданных.
+
+    Возвращает файл с тем же именем; результат пишется во временный
+    файл, который держится в памяти только пока он небольшой.
+    """
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError(
+            'Загрузите правильное изображение.', code='invalid_image'
+        )
+    with image:
+        if image.format not in ALLOWED_FORMATS:
+            raise ValidationError(
+                'Поддерживаются только JPEG, PNG, GIF и WebP.',
+                code='invalid_format',
+            )
+        _check_pixels(image)
+        output = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        try:
+            if getattr(image, 'is_animated', False):
+                _save_animation(image, output)
+            else:
+                _save_still(image, output)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            output.close()
+            raise ValidationError(
+                'Загрузите правильное изображение.', code='invalid_image'
+            )
+    output.seek(0)
+    return File(output, name=os.path.basename(upload.name))
@@ -0,0 +1,98 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from posts.feeds import feed_posts
+from posts.models import Comment, Follow, Post
+from posts.seeding import seed_data
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими постами внутри транзакции и '
+        'сравнивает планы и время запросов лент без составных индексов '
+        'и с ними. Все изменения откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--comments', type=int, default=200_000)
+        parser.add_argument('--follows-per-user', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            started = time.perf_counter()
+            ids = seed_data(
+                users=options['users'], groups=options['groups'],
+                posts=options['posts'], comments=options['comments'],
+                follows_per_user=options['follows_per_user'],
+                seed=options['seed'], skip_derived=True,
+            )
+            self.stdout.write(
+                f'Данные созданы за {time.perf_counter() - started:.1f} с.'
+            )
+            queries = self.feed_queries(ids)
+            after = self.measure(queries, options['repeat'], 'after')
+            self.drop_feed_indexes()
+            before = self.measure(queries, options['repeat'], 'before')
+            for name in queries:
+                self.report(name, before[name], after[name])
+            transaction.set_rollback(True)
+
+    def feed_queries(self, ids):
+        post = Post.objects.get(pk=ids['posts'][len(ids['posts']) // 2])
+        follow = Follow.objects.first()
+        return {
+            'index': feed_posts()[:10],
+            'group_posts': feed_posts(group_id=ids['groups'][0])[:10],
+            'profile': feed_posts(author_id=ids['users'][0])[:10],
+            'post_detail comments': Comment.objects.filter(post=post)[:20],
+            'profile following': Follow.objects.filter(
+                user_id=follow.user_id, author_id=follow.author_id
+            ),
+        }
+
+    def explain(self, queryset, label):
+        # Метка в тексте запроса не даёт sqlite3 взять старый план из
+        # кеша подготовленных выражений после DROP INDEX.
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'{connection.ops.explain_prefix} {sql} /* {label} */',
+                params,
+            )
+            return '\n'.join(
+                ' '.join(str(column) for column in row)
+                for row in cursor.fetchall()
+            )
+
+    def measure(self, queries, repeat, label):
+        results = {}
+        for name, queryset in queries.items():
+            plan = self.explain(queryset, label)
+            started = time.perf_counter()
+            for _ in range(repeat):
+                list(queryset.all())
+            elapsed = (time.perf_counter() - started) / repeat * 1000
+            results[name] = (plan, elapsed)
+        return results
+
+    def drop_feed_indexes(self):
+        with connection.cursor() as cursor:
+            for model in (Post, Comment):
+                for index in model._meta.indexes:
+                    cursor.execute(
+                        f'DROP INDEX {connection.ops.quote_name(index.name)}'
+                    )
+
+    def report(self, name, before, after):
+        self.stdout.write(self.style.MIGRATE_HEADING(name))
+        for title, (plan, elapsed) in (('до', before), ('после', after)):
+            self.stdout.write(f'  {title}: {elapsed:.3f} мс')
+            for line in plan.splitlines():
+                self.stdout.write(f'    {line}')
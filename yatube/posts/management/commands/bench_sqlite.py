@@ -0,0 +1,185 @@
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core.sqlite_backend.base import PRAGMAS
+from posts.models import Post, User
+from posts.seeding import seed_data
+
+from .bench_views import BENCH_ADDR, bench_database, percentile
+
+# Поведение django.db.backends.sqlite3: без прагм и с обычным BEGIN.
+STOCK_OPTIONS = {
+    'pragmas': {name: None for name in PRAGMAS},
+    'transaction_mode': 'DEFERRED',
+    'write_transaction_mode': 'DEFERRED',
+}
+
+
+def read(client, posts, rng):
+    post_id, username, _ = rng.choice(posts)
+    url = rng.choice((
+        reverse('posts:index'),
+        reverse('posts:post_detail', args=(post_id,)),
+        reverse('posts:profile', args=(username,)),
+        reverse('posts:follow_index'),
+    ))
+    return [client.get(url)]
+
+
+def write(client, posts, rng):
+    post_id, username, _ = rng.choice(posts)
+    if rng.random() < 0.5:
+        return [client.post(
+            reverse('posts:add_comment', args=(post_id,)),
+            {'text': 'Нагрузка'},
+        )]
+    # Подписка и отписка: profile_unfollow читает и удаляет в одной
+    # транзакции.
+    return [
+        client.get(reverse('posts:profile_follow', args=(username,))),
+        client.get(reverse('posts:profile_unfollow', args=(username,))),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает SQLite без настроек и с прагмами core.sqlite_backend '
+        'под конкурентной нагрузкой: клиенты в потоках читают ленты и '
+        'посты и пишут комментарии и подписки. Для каждого режима '
+        'сообщает операции в секунду, задержки и ошибки «database is '
+        'locked».'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=8)
+        parser.add_argument(
+            '--operations', type=int, default=400,
+            help='Операций на всех клиентов вместе в каждом режиме.',
+        )
+        parser.add_argument(
+            '--write-share', type=float, default=0.3,
+            help='Доля пишущих операций.',
+        )
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--posts', type=int, default=2_000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        tuned_options = connection.settings_dict['OPTIONS']
+        results = {}
+        with override_settings(DEBUG=False):
+            for mode, mode_options in (
+                ('stock', STOCK_OPTIONS), ('tuned', tuned_options),
+            ):
+                with self.database_options(mode_options), bench_database():
+                    results[mode] = self.run_mode(options)
+                self.report(mode, results[mode])
+        stock, tuned = results['stock'], results['tuned']
+        self.stdout.write(self.style.SUCCESS(
+            f'Пропускная способность ×{tuned["ops"] / stock["ops"]:.2f}, '
+            f'ошибок {stock["errors"]} → {tuned["errors"]}.'
+        ))
+
+    @contextmanager
+    def database_options(self, options):
+        """
+        OPTIONS для всех новых соединений: потоки создают их из общего
+        settings_dict.
+        """
+        settings_dict = connection.settings_dict
+        old_options = settings_dict['OPTIONS']
+        connections.close_all()
+        settings_dict['OPTIONS'] = options
+        try:
+            yield
+        finally:
+            connections.close_all()
+            settings_dict['OPTIONS'] = old_options
+
+    def run_mode(self, options):
+        ids = seed_data(
+            users=options['users'], groups=10, posts=options['posts'],
+            comments=options['posts'], follows_per_user=10,
+            seed=options['seed'],
+        )
+        posts = list(Post.objects.filter(
+            id__in=ids['posts']
+        ).values_list('id', 'author__username', 'author_id'))
+        cache.clear()
+        clients = options['clients']
+        latencies = defaultdict(list)
+        statuses = Counter()
+        lock = threading.Lock()
+
+        def run_client(number):
+            rng = random.Random(options['seed'] * 1000 + number)
+            client = Client(REMOTE_ADDR=BENCH_ADDR)
+            own_latencies = defaultdict(list)
+            codes = Counter()
+            try:
+                client.force_login(
+                    User.objects.get(pk=rng.choice(ids['users']))
+                )
+                for _ in range(options['operations'] // clients):
+                    kind = (
+                        'write' if rng.random() < options['write_share']
+                        else 'read'
+                    )
+                    operation = write if kind == 'write' else read
+                    started = time.perf_counter()
+                    try:
+                        for response in operation(client, posts, rng):
+                            codes[response.status_code] += 1
+                    except Exception as error:
+                        codes[type(error).__name__] += 1
+                    own_latencies[kind].append(
+                        time.perf_counter() - started
+                    )
+            finally:
+                connection.close()
+            with lock:
+                for kind, values in own_latencies.items():
+                    latencies[kind].extend(values)
+                statuses.update(codes)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(clients) as pool:
+            list(pool.map(run_client, range(clients)))
+        elapsed = time.perf_counter() - started
+        return {
+            'ops': sum(map(len, latencies.values())) / elapsed,
+            'latencies': latencies,
+            'statuses': statuses,
+            'errors': sum(
+                count for status, count in statuses.items()
+                if not isinstance(status, int) or status >= 500
+            ),
+        }
+
+    def report(self, mode, result):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{mode}: {result["ops"]:.1f} операций/с, '
+            f'ошибок {result["errors"]}'
+        ))
+        for kind, values in sorted(result['latencies'].items()):
+            self.stdout.write(
+                f'  {kind:<6} p50 {percentile(values, 50) * 1000:7.1f}  '
+                f'p95 {percentile(values, 95) * 1000:7.1f}  '
+                f'p99 {percentile(values, 99) * 1000:7.1f} мс'
+            )
+        self.stdout.write('  ' + ', '.join(
+            f'{status}: {count}'
+            for status, count in sorted(
+                result['statuses'].items(), key=lambda item: str(item[0])
+            )
+        ))
@@ -0,0 +1,349 @@
+import json
+import math
+import platform
+import random
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from io import BytesIO
+
+import django
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from core import metrics
+from posts import thumbnails
+from posts.models import Group, Post, User
+from posts.seeding import WORDS, seed_data
+
+SCALES = {
+    'small': {
+        'users': 200, 'groups': 10, 'posts': 2_000, 'comments': 5_000,
+        'follows_per_user': 20, 'images': 10,
+    },
+    'medium': {
+        'users': 2_000, 'groups': 50, 'posts': 20_000, 'comments': 50_000,
+        'follows_per_user': 50, 'images': 30,
+    },
+    'large': {
+        'users': 10_000, 'groups': 100, 'posts': 200_000,
+        'comments': 500_000, 'follows_per_user': 100, 'images': 100,
+    },
+}
+# Доля постов с картинкой.
+IMAGE_SHARE = 0.3
+# Сколько разных постов (и их авторов) запрашивают клиенты.
+SAMPLE_SIZE = 200
+# Не из INTERNAL_IPS, чтобы не включался debug_toolbar.
+BENCH_ADDR = '10.0.0.1'
+
+
+class Target:
+    """Адрес из posts/urls.py и способ его запросить."""
+
+    def __init__(self, name, method='get', login=False, data=None):
+        self.name = name
+        self.method = method
+        self.login = login
+        self.data = data
+
+    def kwargs(self, dataset, own_post, rng):
+        if self.name in ('post_detail', 'post_comments', 'add_comment'):
+            return {'post_id': rng.choice(dataset['posts'])[0]}
+        if self.name == 'post_edit':
+            return {'post_id': own_post[0]}
+        if self.name == 'group_list':
+            return {'slug': rng.choice(dataset['groups'])}
+        if self.name in ('profile', 'profile_follow'):
+            return {'username': rng.choice(dataset['posts'])[1]}
+        return {}
+
+    def request(self, client, dataset, own_post, rng):
+        url = reverse(
+            f'posts:{self.name}', kwargs=self.kwargs(dataset, own_post, rng)
+        )
+        data = self.data
+        if self.name == 'search':
+            data = {'q': rng.choice(WORDS)}
+        return getattr(client, self.method)(url, data)
+
+
+# profile_unfollow не замеряется: он только откатывает profile_follow.
+TARGETS = [
+    Target('index'),
+    Target('group_list'),
+    Target('profile'),
+    Target('post_detail'),
+    Target('post_comments'),
+    Target('search'),
+    Target('follow_index', login=True),
+    Target('post_create', login=True),
+    Target('post_edit', login=True),
+    Target('add_comment', 'post', login=True, data={'text': 'Нагрузка'}),
+    Target('profile_follow', login=True),
+]
+
+
+def percentile(values, percent):
+    """Процентиль методом ближайшего ранга; для пустой выборки — 0."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = math.ceil(percent / 100 * len(ordered))
+    return ordered[max(rank, 1) - 1]
+
+
+@contextmanager
+def bench_database():
+    """
+    Отдельная база в файле, как у тестов, но видимая соединениям
+    всех потоков-клиентов. Рабочая база не трогается.
+    """
+    directory = tempfile.mkdtemp()
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    old_test_name = test_settings.get('NAME')
+    test_settings['NAME'] = f'{directory}/bench.sqlite3'
+    old_name = connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False
+    )
+    try:
+        yield
+    finally:
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        test_settings['NAME'] = old_test_name
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный замер страниц posts: заполняет временную базу '
+        'данными нужного масштаба, гоняет каждый адрес из posts/urls.py '
+        'несколькими клиентами в потоках и сообщает p50/p95/p99, '
+        'запросы в секунду и SQL-запросы на запрос. Результаты '
+        'пишутся в JSON для сравнения прогонов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scales', nargs='+', choices=list(SCALES), default=['small']
+        )
+        parser.add_argument('--clients', type=int, default=8)
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Запросов к каждому адресу на все клиенты вместе.',
+        )
+        parser.add_argument(
+            '--urls', nargs='+', choices=[t.name for t in TARGETS],
+            default=[t.name for t in TARGETS],
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Файл для результатов в JSON.')
+        parser.add_argument(
+            '--compare', help='JSON прошлого прогона для сравнения.'
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as file:
+                    baseline = json.load(file)
+            except (OSError, ValueError) as error:
+                raise CommandError(
+                    f'Не прочитать {options["compare"]}: {error}'
+                )
+        targets = [t for t in TARGETS if t.name in options['urls']]
+        report = {
+            'started': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'clients': options['clients'],
+            'requests': options['requests'],
+            'seed': options['seed'],
+            'results': [],
+        }
+        media_root = tempfile.mkdtemp()
+        try:
+            # Без DEBUG не копится connection.queries и не включается
+            # debug_toolbar.
+            with override_settings(DEBUG=False, MEDIA_ROOT=media_root):
+                for scale in options['scales']:
+                    with bench_database():
+                        report['results'] += self.run_scale(
+                            scale, targets, options
+                        )
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+        if baseline is not None:
+            self.compare(baseline, report)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Результаты записаны в {options["output"]}.')
+
+    def seed(self, scale, seed, rng):
+        sizes = SCALES[scale]
+        started = time.perf_counter()
+        ids = seed_data(
+            users=sizes['users'], groups=sizes['groups'],
+            posts=sizes['posts'], comments=sizes['comments'],
+            follows_per_user=sizes['follows_per_user'], seed=seed,
+        )
+        self.attach_images(ids['posts'], sizes['images'], rng)
+        cache.clear()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{scale}: данные созданы за {elapsed:.1f} с.')
+        return ids
+
+    def attach_images(self, post_ids, count, rng):
+        """Картинки части постов с уже построенными миниатюрами."""
+        storage = Post._meta.get_field('image').storage
+        names = []
+        for number in range(count):
+            buffer = BytesIO()
+            color = tuple(rng.randrange(256) for _ in range(3))
+            Image.new('RGB', (1200, 800), color).save(buffer, 'JPEG')
+            names.append(storage.save(
+                f'posts/bench_{number}.jpg', ContentFile(buffer.getvalue())
+            ))
+        for name in names:
+            thumbnails.generate(name)
+        with_images = rng.sample(post_ids, int(len(post_ids) * IMAGE_SHARE))
+        for number, name in enumerate(names):
+            Post.objects.filter(
+                id__in=with_images[number::len(names)]
+            ).update(image=name)
+
+    def dataset(self, ids, rng):
+        """Посты, авторы и группы, по которым ходят клиенты."""
+        sample = rng.sample(ids['posts'], min(SAMPLE_SIZE, len(ids['posts'])))
+        return {
+            'posts': list(Post.objects.filter(id__in=sample).values_list(
+                'id', 'author__username', 'author_id'
+            ).order_by('id')),
+            'groups': list(Group.objects.filter(
+                id__in=ids['groups']
+            ).values_list('slug', flat=True).order_by('id')),
+        }
+
+    def run_scale(self, scale, targets, options):
+        rng = random.Random(options['seed'])
+        dataset = self.dataset(self.seed(scale, options['seed'], rng), rng)
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{scale}: {options["clients"]} клиентов, '
+            f'{options["requests"]} запросов на адрес'
+        ))
+        results = []
+        for target in targets:
+            cache.clear()
+            metrics.reset()
+            started = time.perf_counter()
+            latencies, statuses = self.drive(target, dataset, options)
+            elapsed = time.perf_counter() - started
+            results.append(self.summarize(
+                scale, target, latencies, statuses, elapsed
+            ))
+            self.report(results[-1])
+        return results
+
+    def drive(self, target, dataset, options):
+        """Запросы к адресу из --clients потоков, у каждого свой клиент."""
+        clients = options['clients']
+        per_client = [
+            options['requests'] // clients
+            + (number < options['requests'] % clients)
+            for number in range(clients)
+        ]
+        latencies = []
+        statuses = Counter()
+        lock = threading.Lock()
+
+        def run_client(number):
+            rng = random.Random(options['seed'] * 1000 + number)
+            # Свой пост нужен для post_edit, автор — для входа.
+            own_post = rng.choice(dataset['posts'])
+            client = Client(REMOTE_ADDR=BENCH_ADDR)
+            own = []
+            codes = Counter()
+            try:
+                if target.login:
+                    client.force_login(User.objects.get(pk=own_post[2]))
+                for _ in range(per_client[number]):
+                    started = time.perf_counter()
+                    try:
+                        status = target.request(
+                            client, dataset, own_post, rng
+                        ).status_code
+                    except Exception as error:
+                        status = type(error).__name__
+                    own.append(time.perf_counter() - started)
+                    codes[status] += 1
+            finally:
+                connection.close()
+            with lock:
+                latencies.extend(own)
+                statuses.update(codes)
+
+        with ThreadPoolExecutor(clients) as pool:
+            list(pool.map(run_client, range(clients)))
+        return latencies, statuses
+
+    def summarize(self, scale, target, latencies, statuses, elapsed):
+        view_metrics = metrics.views.get(f'posts:{target.name}')
+        queries = view_metrics.histograms['queries'] if view_metrics else None
+        errors = sum(
+            count for status, count in statuses.items()
+            if not isinstance(status, int) or status >= 400
+        )
+        return {
+            'scale': scale,
+            'url': target.name,
+            'requests': len(latencies),
+            'errors': errors,
+            'statuses': {str(status): n for status, n in statuses.items()},
+            'rps': len(latencies) / elapsed if elapsed else 0,
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+            'queries_per_request': (
+                queries.sum / queries.count if queries and queries.count
+                else None
+            ),
+        }
+
+    def report(self, result):
+        queries = result['queries_per_request']
+        self.stdout.write(
+            f'  {result["url"]:<16} {result["rps"]:8.1f} запр/с  '
+            f'p50 {result["p50_ms"]:7.1f}  p95 {result["p95_ms"]:7.1f}  '
+            f'p99 {result["p99_ms"]:7.1f} мс  '
+            f'SQL {queries if queries is None else f"{queries:.1f}"}  '
+            f'ошибок {result["errors"]}'
+        )
+
+    def compare(self, baseline, report):
+        before = {
+            (result['scale'], result['url']): result
+            for result in baseline.get('results', [])
+        }
+        self.stdout.write(self.style.MIGRATE_HEADING('Сравнение с прошлым'))
+        for result in report['results']:
+            old = before.get((result['scale'], result['url']))
+            if old is None:
+                continue
+            self.stdout.write(
+                f'  {result["scale"]}/{result["url"]:<16} '
+                f'запр/с {old["rps"]:.1f} → {result["rps"]:.1f}, '
+                f'p95 {old["p95_ms"]:.1f} → {result["p95_ms"]:.1f} мс'
+            )
@@ -0,0 +1,72 @@
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from sorl.thumbnail import delete as delete_thumbnails
+
+from core import tagged_cache
+from core.storage import content_hash
+from posts import cache_tags
+from posts.models import Post
+from posts.thumbnails import source_file
+
+
+class Command(BaseCommand):
+    help = (
+        'Переименовывает картинки постов по хешу содержимого: одинаковые '
+        'файлы сводятся к одному, старые копии и их миниатюры удаляются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        storage = Post._meta.get_field('image').storage
+        renamed = {}
+        sizes = {}
+        for name in Post.objects.exclude(image='').order_by().values_list(
+            'image', flat=True
+        ).distinct().iterator():
+            if not storage.exists(name):
+                continue
+            with storage.open(name) as file:
+                new_name = storage.hashed_name(name, content_hash(file))
+            if new_name == name:
+                continue
+            renamed[name] = new_name
+            sizes[name] = sizes[new_name] = storage.size(name)
+        unique = set(renamed.values())
+        freed = sum(sizes[name] for name in renamed) - sum(
+            sizes[name] for name in unique if not storage.exists(name)
+        )
+        self.stdout.write(
+            f'Файлов: {len(renamed)}, уникальных: {len(unique)}, '
+            f'освободится около {freed / 2 ** 20:.1f} МБ.'
+        )
+        if options['dry_run'] or not renamed:
+            return
+        # Сначала появляются новые файлы, потом на них переходят посты,
+        # и только после этого удаляются старые: сбой посередине не
+        # оставит пост без картинки.
+        for old_name, new_name in renamed.items():
+            if not storage.exists(new_name):
+                with storage.open(old_name) as file:
+                    storage.save(new_name, file)
+        with transaction.atomic():
+            tags = set()
+            for old_name, new_name in renamed.items():
+                posts = Post.objects.filter(image=old_name)
+                for post in posts.only('id', 'author_id', 'group_id'):
+                    tags.update(cache_tags.post_tags(post))
+                posts.update(image=new_name, updated=timezone.now())
+            # update() не шлёт сигналов: без этого закешированные
+            # страницы ссылались бы на удаляемые ниже файлы.
+            tagged_cache.invalidate(*tags)
+        for old_name in renamed:
+            delete_thumbnails(source_file(old_name), delete_file=False)
+            os.remove(storage.path(old_name))
+        self.stdout.write(self.style.SUCCESS(
+            f'Переименовано {len(renamed)}, удалено копий: '
+            f'{len(renamed) - len(unique)}.'
+        ))
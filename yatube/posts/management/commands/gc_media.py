@@ -0,0 +1,247 @@
+import os
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.helpers import deserialize
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix, del_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from posts.models import Post
+from posts.seeding import batched
+
+
+def scan_files(root):
+    """
+    Обходит каталог через os.scandir, не собирая список файлов
+    целиком; отдаёт пути и stat.
+    """
+    stack = [root]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry.path, entry.stat(follow_symlinks=False)
+
+
+def kvstore_keys(prefix, batch_size):
+    """Ключи KV store sorl с префиксом, пачками по первичному ключу."""
+    last = ''
+    while True:
+        keys = list(KVStoreModel.objects.filter(
+            key__startswith=prefix, key__gt=last
+        ).order_by('key').values_list('key', flat=True)[:batch_size])
+        if not keys:
+            return
+        yield keys
+        last = keys[-1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки постов, на которые не ссылается ни один пост, '
+        'миниатюры таких картинок и файлы миниатюр без записи в KV store. '
+        'Хранилище и KV store обходятся пачками.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--grace-period', type=int, default=60 * 60,
+            help='Не трогать файлы моложе стольких секунд.',
+        )
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.batch_size = options['batch_size']
+        self.cutoff = time.time() - options['grace_period']
+        self.image_storage = Post._meta.get_field('image').storage
+        # Так же, как ImageFile.serialize_storage записывает хранилище
+        # исходника в KV store.
+        storage_class = type(self.image_storage)
+        self.live_storage = (
+            f'{storage_class.__module__}.{storage_class.__name__}'
+        )
+        for title, phase in (
+            ('Миниатюры удалённых картинок', self.collect_sources),
+            ('Картинки постов', self.collect_images),
+            ('Файлы миниатюр', self.collect_thumbnail_files),
+        ):
+            started = time.perf_counter()
+            stats = phase()
+            self.report(title, stats, time.perf_counter() - started)
+
+    def referenced(self, names):
+        return set(Post.objects.filter(image__in=names).values_list(
+            'image', flat=True
+        ))
+
+    def is_recent(self, storage, name):
+        """Файл моложе --grace-period; удалённый файл не свежий."""
+        try:
+            return os.stat(storage.path(name)).st_mtime >= self.cutoff
+        except FileNotFoundError:
+            return False
+
+    def recently_used(self, image, thumbnail_keys, thumbnail_names):
+        """
+        У исходника без постов есть свежие файлы: картинку только что
+        загрузили снова или для неё только что строились миниатюры.
+        """
+        if image is not None and image['storage'] == self.live_storage:
+            if self.is_recent(self.image_storage, image['name']):
+                return True
+        return any(
+            self.is_recent(default.storage, thumbnail_names[key])
+            for key in thumbnail_keys if key in thumbnail_names
+        )
+
+    def delete_file(self, storage, name, stats, size=None):
+        stats['deleted'] += 1
+        if size is None:
+            try:
+                size = storage.size(name)
+            except OSError:
+                size = 0
+        stats['bytes'] += size
+        if not self.dry_run:
+            storage.delete(name)
+
+    def collect_sources(self):
+        """Исходники в KV store, на которые больше не ссылаются посты."""
+        stats = Counter()
+        for keys in kvstore_keys(
+            add_prefix('', 'thumbnails'), self.batch_size
+        ):
+            stats['scanned'] += len(keys)
+            lists = dict(KVStoreModel.objects.filter(
+                key__in=keys
+            ).values_list('key', 'value'))
+            sources = {
+                add_prefix(del_prefix(key)): key for key in keys
+            }
+            images = {
+                key: deserialize(value)
+                for key, value in KVStoreModel.objects.filter(
+                    key__in=sources
+                ).values_list('key', 'value')
+            }
+            live = self.referenced([
+                image['name'] for image in images.values()
+                if image['storage'] == self.live_storage
+            ])
+            dead = [
+                key for key in sources
+                if key not in images
+                or images[key]['storage'] != self.live_storage
+                or images[key]['name'] not in live
+            ]
+            thumbnail_keys = {
+                source: [
+                    add_prefix(key)
+                    for key in deserialize(lists[sources[source]])
+                ]
+                for source in dead
+            }
+            thumbnail_names = {
+                key: deserialize(value)['name']
+                for key, value in KVStoreModel.objects.filter(key__in=[
+                    key for keys in thumbnail_keys.values() for key in keys
+                ]).values_list('key', 'value')
+            }
+            dead = [
+                source for source in dead
+                if not self.recently_used(
+                    images.get(source), thumbnail_keys[source],
+                    thumbnail_names,
+                )
+            ]
+            dead_thumbnails = [
+                key for source in dead for key in thumbnail_keys[source]
+            ]
+            for key in dead_thumbnails:
+                if key in thumbnail_names:
+                    self.delete_file(
+                        default.storage, thumbnail_names[key], stats
+                    )
+            if not self.dry_run:
+                default.kvstore._delete_raw(
+                    *dead, *(sources[key] for key in dead), *dead_thumbnails
+                )
+        return stats
+
+    def scan_storage(self, storage, directory):
+        """Файлы каталога хранилища пачками: (имя, stat)."""
+        root = storage.path('')
+        for batch in batched(
+            scan_files(storage.path(directory)), self.batch_size
+        ):
+            yield [
+                (os.path.relpath(path, root).replace(os.sep, '/'), stat)
+                for path, stat in batch
+            ]
+
+    def collect_images(self):
+        """Файлы картинок, на которые не ссылается ни один пост."""
+        stats = Counter()
+        directory = Post._meta.get_field('image').upload_to
+        for batch in self.scan_storage(self.image_storage, directory):
+            stats['scanned'] += len(batch)
+            live = self.referenced([name for name, _ in batch])
+            candidates = [
+                (name, stat) for name, stat in batch
+                if name not in live and stat.st_mtime < self.cutoff
+            ]
+            if not candidates:
+                continue
+            # Пока шёл обход, ту же картинку могли загрузить снова: save
+            # обновляет mtime, а новый пост уже может на неё ссылаться.
+            live = self.referenced([name for name, _ in candidates])
+            for name, stat in candidates:
+                if name not in live and not self.is_recent(
+                    self.image_storage, name
+                ):
+                    self.delete_file(
+                        self.image_storage, name, stats, stat.st_size
+                    )
+        return stats
+
+    def collect_thumbnail_files(self):
+        """Файлы миниатюр, о которых не знает KV store."""
+        stats = Counter()
+        for batch in self.scan_storage(
+            default.storage, sorl_settings.THUMBNAIL_PREFIX
+        ):
+            stats['scanned'] += len(batch)
+            keys = {
+                add_prefix(ImageFile(name, default.storage).key): (name, stat)
+                for name, stat in batch
+            }
+            known = set(KVStoreModel.objects.filter(
+                key__in=keys
+            ).values_list('key', flat=True))
+            for key, (name, stat) in keys.items():
+                if key not in known and stat.st_mtime < self.cutoff:
+                    self.delete_file(
+                        default.storage, name, stats, stat.st_size
+                    )
+        return stats
+
+    def report(self, title, stats, elapsed):
+        verb = 'к удалению' if self.dry_run else 'удалено'
+        rate = stats['scanned'] / elapsed if elapsed else 0
+        self.stdout.write(
+            f'{title}: просмотрено {stats["scanned"]} за {elapsed:.1f} с '
+            f'({rate:.0f}/с), {verb} {stats["deleted"]} '
+            f'({stats["bytes"] / 2 ** 20:.1f} МБ).'
+        )
@@ -0,0 +1,57 @@
+import multiprocessing
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+
+from posts.models import Post
+from posts.thumbnails import generate, is_generated
+
+
+def generate_one(source_name):
+    try:
+        generate(source_name)
+    except Exception as error:
+        return source_name, str(error)
+    finally:
+        connection.close()
+    return source_name, None
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит недостающие миниатюры картинок постов в нескольких '
+        'процессах.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=os.cpu_count())
+        parser.add_argument('--chunksize', type=int, default=8)
+
+    def handle(self, *args, **options):
+        images = Post.objects.exclude(image='').order_by().values_list(
+            'image', flat=True
+        ).distinct()
+        missing = [name for name in images if not is_generated(name)]
+        self.stdout.write(f'Картинок без миниатюр: {len(missing)}')
+        if not missing:
+            return
+        # Соединения с базой не должны переходить в дочерние процессы.
+        connections.close_all()
+        started = time.perf_counter()
+        failed = 0
+        context = multiprocessing.get_context('fork')
+        with context.Pool(options['processes']) as pool:
+            for name, error in pool.imap_unordered(
+                generate_one, missing, options['chunksize']
+            ):
+                if error:
+                    failed += 1
+                    self.stderr.write(f'{name}: {error}')
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {len(missing) - failed} за {elapsed:.1f} с '
+            f'({(len(missing) - failed) / elapsed:.1f} картинок/с), '
+            f'ошибок: {failed}.'
+        ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики постов и пользователей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько строк обновлять одним запросом.',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        with transaction.atomic():
+            comments = counters.reconcile_comments_counts(batch_size)
+            users = counters.reconcile_user_stats(batch_size)
+        self.stdout.write(
+            f'Исправлено счётчиков комментариев: {comments}, '
+            f'счётчиков пользователей: {users}.'
+        )
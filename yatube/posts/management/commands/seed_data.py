@@ -0,0 +1,178 @@
+import os
+import random
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core import tagged_cache
+from posts import cache_tags, counters, search
+from posts.models import Comment, Follow, Group, Post, User
+from posts.seeding import (
+    batched,
+    build_comments,
+    build_follows,
+    build_groups,
+    build_posts,
+    build_users,
+    fill_timelines,
+    new_id_range,
+    seed_prefix,
+)
+
+
+def generate(pool, build, specs, ahead):
+    """
+    Пачки по порядку specs. С пулом процессов следующие ahead пачек
+    строятся, пока текущая пишется в базу.
+    """
+    if pool is None:
+        for spec in specs:
+            yield build(*spec)
+        return
+    pending = deque()
+    for spec in specs:
+        pending.append(pool.submit(build, *spec))
+        if len(pending) > ahead:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class Command(BaseCommand):
+    help = (
+        'Быстро заполняет базу синтетическими пользователями, группами, '
+        'постами, комментариями и подписками: объекты строятся '
+        'параллельно в процессах-воркерах, в базу пишутся bulk_create '
+        'пачками, каждая в своей транзакции. Одинаковый --seed даёт '
+        'одинаковые данные при любом числе воркеров. Затем достраиваются '
+        'счётчики, ленты подписок и поисковый индекс.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--comments', type=int, default=2_000_000)
+        parser.add_argument(
+            '--follows-per-user', type=int, default=50,
+            help='Подписок на пользователя, авторы по закону Ципфа.',
+        )
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument(
+            '--workers', type=int, default=(os.cpu_count() or 1) - 1,
+            help=(
+                'Процессов для построения пачек, пока основной пишет их '
+                'в базу; 0 — всё в одном процессе.'
+            ),
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--skip-derived', action='store_true',
+            help='Не пересчитывать счётчики, ленты и поисковый индекс.',
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        started = time.perf_counter()
+        self.total_rows = 0
+        workers = options['workers']
+        with (
+            ProcessPoolExecutor(workers) if workers else nullcontext()
+        ) as self.pool:
+            self.seed_tables()
+        if not options['skip_derived']:
+            self.fill_derived()
+        self.forget_cached()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Всего {self.total_rows} строк за {elapsed:.1f} с, '
+            f'{self.total_rows / elapsed:.0f} строк/с.'
+        ))
+
+    def seed_tables(self):
+        options = self.options
+        seed = options['seed']
+        prefix = seed_prefix(random.Random(seed))
+        self.user_ids = self.insert(
+            User, build_users, options['users'], prefix
+        )
+        self.group_ids = group_ids = self.insert(
+            Group, build_groups, options['groups'], prefix
+        )
+        self.post_ids = self.insert(
+            Post, build_posts, options['posts'], self.user_ids, group_ids
+        )
+        if self.post_ids:
+            self.insert(
+                Comment, build_comments, options['comments'],
+                self.user_ids, self.post_ids,
+            )
+        per_user = options['follows_per_user']
+        if per_user and self.user_ids:
+            users_per_batch = max(1, options['batch_size'] // per_user)
+            batches = -(-len(self.user_ids) // users_per_batch)
+            self.write(Follow, build_follows, (
+                (seed, number, users_per_batch, self.user_ids, per_user)
+                for number in range(batches)
+            ), ignore_conflicts=True)
+
+    def insert(self, model, build, count, *args):
+        """Создаёт count строк model пачками и возвращает диапазон их id."""
+        size = self.options['batch_size']
+        specs = (
+            (self.options['seed'], number,
+             min(size, count - number * size), *args)
+            for number in range(-(-count // size))
+        )
+        return new_id_range(model, lambda: self.write(model, build, specs))
+
+    def write(self, model, build, specs, **bulk_options):
+        started = time.perf_counter()
+        rows = 0
+        ahead = 2 * (self.options['workers'] or 1)
+        for batch in generate(self.pool, build, specs, ahead):
+            with transaction.atomic():
+                model.objects.bulk_create(batch, **bulk_options)
+            rows += len(batch)
+        self.report(model._meta.db_table, rows, started)
+
+    def fill_derived(self):
+        started = time.perf_counter()
+        counters.reconcile_user_stats()
+        counters.reconcile_comments_counts()
+        self.report('счётчики', 0, started)
+        started = time.perf_counter()
+        with transaction.atomic():
+            rows = fill_timelines()
+        self.report('ленты подписок', rows, started)
+        if self.post_ids:
+            started = time.perf_counter()
+            with transaction.atomic():
+                rows = search.index_posts(Post.objects.filter(id__range=(
+                    self.post_ids[0], self.post_ids[-1]
+                )))
+            self.report('поисковый индекс', rows, started)
+
+    def forget_cached(self):
+        """
+        Сигналы при bulk_create не срабатывают: работающий сайт отдавал
+        бы прежние ленты, 304 и счётчики, пока не сбросить их здесь.
+        """
+        tagged_cache.invalidate(cache_tags.INDEX)
+        for user_ids in batched(self.user_ids, self.options['batch_size']):
+            tagged_cache.invalidate(*map(cache_tags.author, user_ids))
+            counters.forget_feeds(user_ids, [])
+        tagged_cache.invalidate(*map(cache_tags.group, self.group_ids))
+        counters.forget_feeds([], self.group_ids)
+
+    def report(self, label, rows, started):
+        elapsed = time.perf_counter() - started
+        self.total_rows += rows
+        line = f'{label}: {elapsed:.1f} с'
+        if rows:
+            line += f', {rows} строк, {rows / max(elapsed, 1e-9):.0f} строк/с'
+        self.stdout.write(line)
@@ -0,0 +1,67 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:29
+
+from collections import Counter
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from core.stemming import stem, words
+
+# Копия posts.search на момент миграции: тот модуль может измениться.
+STOP_WORDS = frozenset((
+    'а', 'без', 'бы', 'в', 'во', 'вот', 'да', 'для', 'до', 'же', 'за',
+    'и', 'из', 'или', 'к', 'ко', 'ли', 'на', 'над', 'не', 'ни', 'но',
+    'о', 'об', 'от', 'по', 'под', 'при', 'с', 'со', 'то', 'у', 'что',
+))
+TERM_LENGTH = 64
+
+
+def post_terms(text):
+    return Counter(
+        stem(word)[:TERM_LENGTH]
+        for word in words(text)
+        if word not in STOP_WORDS
+    )
+
+
+def build_index(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    PostTerm = apps.get_model('posts', 'PostTerm')
+    batch = []
+    for post_id, text in Post.objects.values_list('id', 'text').iterator():
+        batch.extend(
+            PostTerm(post_id=post_id, term=term, count=count)
+            for term, count in post_terms(text).items()
+        )
+        if len(batch) >= 1000:
+            PostTerm.objects.bulk_create(batch)
+            batch = []
+    PostTerm.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_post_image_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='Основа слова')),
+                ('count', models.PositiveIntegerField(verbose_name='Число вхождений')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terms', to='posts.Post', verbose_name='Пост')),
+            ],
+            options={
+                'verbose_name': 'Слово поиска',
+                'verbose_name_plural': 'Поисковый индекс',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='postterm',
+            constraint=models.UniqueConstraint(fields=('term', 'post'), name='unique_post_term'),
+        ),
+        migrations.RunPython(build_index, migrations.RunPython.noop),
+    ]
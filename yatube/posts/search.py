@@ -0,0 +1,123 @@
+import math
+from collections import Counter
+from itertools import islice
+
+from django.db.models import (
+    Case,
+    Count,
+    ExpressionWrapper,
+    F,
+    FloatField,
+    Sum,
+    Value,
+    When,
+)
+
+from core.stemming import stem, words
+
+from .feeds import feed_posts
+from .models import Post, PostTerm
+
+STOP_WORDS = frozenset((
+    'а', 'без', 'бы', 'в', 'во', 'вот', 'да', 'для', 'до', 'же', 'за',
+    'и', 'из', 'или', 'к', 'ко', 'ли', 'на', 'над', 'не', 'ни', 'но',
+    'о', 'об', 'от', 'по', 'под', 'при', 'с', 'со', 'то', 'у', 'что',
+))
+TERM_LENGTH = PostTerm._meta.get_field('term').max_length
+MAX_QUERY_TERMS = 8
+# Насыщение частоты слова в посте, как в BM25.
+SATURATION = 1.2
+
+
+def post_terms(text):
+    """Основы слов текста с числом вхождений, без стоп-слов."""
+    return Counter(
+        stem(word)[:TERM_LENGTH]
+        for word in words(text)
+        if word not in STOP_WORDS
+    )
+
+
+def index_post(post, created=False):
+    """
+    Обновляет слова поста в индексе: удаляет исчезнувшие и
+    изменившиеся, добавляет новые.
+    """
+    terms = post_terms(post.text)
+    stored = {}
+    if not created:
+        stored = dict(PostTerm.objects.filter(
+            post=post
+        ).values_list('term', 'count'))
+    stale = [term for term, count in stored.items() if terms[term] != count]
+    if stale:
+        PostTerm.objects.filter(post=post, term__in=stale).delete()
+    PostTerm.objects.bulk_create([
+        PostTerm(post=post, term=term, count=count)
+        for term, count in terms.items()
+        if stored.get(term) != count
+    ])
+
+
+def index_posts(posts, batch_size=1000):
+    """
+    Индексирует посты, созданные без сигналов (bulk_create):
+    старых слов у них нет, поэтому только вставка пачками.
+    Возвращает число добавленных строк индекса.
+    """
+    terms = (
+        PostTerm(post_id=post_id, term=term, count=count)
+        for post_id, text in posts.values_list('id', 'text').iterator()
+        for term, count in post_terms(text).items()
+    )
+    added = 0
+    while True:
+        batch = list(islice(terms, batch_size))
+        if not batch:
+            return added
+        PostTerm.objects.bulk_create(batch)
+        added += len(batch)
+
+
+def query_terms(query):
+    return list(post_terms(query))[:MAX_QUERY_TERMS]
+
+
+def search_posts(query, total=None):
+    """
+    Посты, содержащие все слова запроса в любой форме, с оценкой
+    score по BM25 без нормировки на длину поста.
+
+    total — число постов для IDF. Его фиксируют на первой странице и
+    передают дальше в курсоре: иначе новые посты сдвигают score между
+    страницами и курсор пропускает или повторяет результаты.
+    """
+    terms = query_terms(query)
+    frequencies = dict(PostTerm.objects.filter(
+        term__in=terms
+    ).values_list('term').annotate(Count('id')))
+    if not terms or len(frequencies) < len(terms):
+        return feed_posts().annotate(
+            score=Value(0.0, output_field=FloatField())
+        ).none()
+    if total is None:
+        total = Post.objects.count()
+    # Пост со словом мог появиться после первой страницы.
+    total = max(total, *frequencies.values())
+    weight = Case(
+        *(
+            When(terms__term=term, then=Value(math.log(
+                1 + (total - frequency + 0.5) / (frequency + 0.5)
+            )))
+            for term, frequency in frequencies.items()
+        ),
+        output_field=FloatField(),
+    )
+    count = F('terms__count')
+    return feed_posts(terms__term__in=terms).annotate(
+        score=Sum(ExpressionWrapper(
+            weight * count * (SATURATION + 1) / (count + SATURATION),
+            output_field=FloatField(),
+        )),
+        matched=Count('terms'),
+    ).filter(matched=len(terms))
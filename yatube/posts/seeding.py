@@ -0,0 +1,182 @@
+import random
+import uuid
+from functools import lru_cache
+from io import StringIO
+from itertools import accumulate, islice
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Max
+
+from .models import Comment, Follow, Group, Post, Timeline, User, UserStats
+
+WORDS = (
+    'лев', 'толстой', 'война', 'мир', 'поход', 'штаб', 'генерал',
+    'здоровье', 'товарищ', 'переход', 'дорога', 'письмо', 'дневник',
+    'утро', 'вечер', 'город', 'деревня', 'книга', 'мысль', 'правда',
+)
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def random_text(rng, words=12):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def last_id(model):
+    return model.objects.aggregate(last=Max('id'))['last'] or 0
+
+
+def new_id_range(model, create):
+    """Вызывает create и возвращает диапазон id созданных им строк."""
+    return new_id_ranges({'ids': model}, create)['ids']
+
+
+def new_id_ranges(models, create):
+    """
+    Вызывает create и возвращает диапазоны id строк, созданных им в
+    каждой модели из словаря models, под теми же ключами.
+    """
+    before = {name: last_id(model) for name, model in models.items()}
+    create()
+    return {
+        name: range(before[name] + 1, last_id(model) + 1)
+        for name, model in models.items()
+    }
+
+
+def seed_data(stdout=None, **options):
+    """
+    Заполняет базу командой seed_data с опциями её аргументов (users,
+    posts, follows_per_user, ...) и возвращает диапазоны id новых
+    пользователей, групп и постов. Замеры берут данные отсюда, чтобы
+    мерить тот же набор, что воспроизводит seed_data.
+    """
+    return new_id_ranges(
+        {'users': User, 'groups': Group, 'posts': Post},
+        lambda: call_command(
+            'seed_data', stdout=stdout or StringIO(), **options
+        ),
+    )
+
+
+def seed_prefix(rng):
+    """
+    Префикс имён и slug. В нём последний id пользователя, поэтому
+    повторный посев с тем же seed не даёт конфликтов.
+    """
+    suffix = uuid.UUID(int=rng.getrandbits(128)).hex[:8]
+    return f'seed_{last_id(User)}_{suffix}'
+
+
+def batch_rng(seed, table, number):
+    """
+    Генератор случайных чисел для пачки: её содержимое зависит только
+    от seed и номера, а не от того, какой воркер и когда её строит.
+    """
+    return random.Random(f'{seed}:{table}:{number}')
+
+
+@lru_cache(maxsize=4)
+def zipf_weights(count):
+    """Накопленные веса закона Ципфа для rng.choices(cum_weights=...)."""
+    return list(accumulate(1 / rank for rank in range(1, count + 1)))
+
+
+def fill_timelines():
+    """
+    Раскладывает посты по лентам подписчиков одним INSERT ... SELECT,
+    как fanout_post при создании каждого поста. Авторы с числом
+    подписчиков больше FEED_FANOUT_LIMIT пропускаются: их посты
+    читаются при запросе ленты. Счётчики пользователей должны быть
+    уже пересчитаны.
+    """
+    quote = connection.ops.quote_name
+    timeline, follow, post, stats = (
+        quote(model._meta.db_table)
+        for model in (Timeline, Follow, Post, UserStats)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {timeline} (user_id, post_id, pub_date) '
+            f'SELECT f.user_id, p.id, p.pub_date FROM {follow} f '
+            f'JOIN {post} p ON p.author_id = f.author_id '
+            f'JOIN {stats} s ON s.user_id = f.author_id '
+            f'WHERE s.followers_count <= %s '
+            f'ON CONFLICT DO NOTHING',
+            [settings.FEED_FANOUT_LIMIT],
+        )
+        return cursor.rowcount
+
+
+def build_users(seed, number, size, prefix):
+    return [User(username=f'{prefix}_{number}_{i}') for i in range(size)]
+
+
+def build_groups(seed, number, size, prefix):
+    rng = batch_rng(seed, 'groups', number)
+    return [
+        Group(title=f'Группа {number}_{i}', slug=f'{prefix}-{number}-{i}',
+              description=random_text(rng))
+        for i in range(size)
+    ]
+
+
+def build_posts(seed, number, size, user_ids, group_ids):
+    rng = batch_rng(seed, 'posts', number)
+    return [
+        Post(
+            author_id=rng.choice(user_ids),
+            group_id=rng.choice(group_ids) if group_ids else None,
+            text=random_text(rng),
+        )
+        for _ in range(size)
+    ]
+
+
+def build_comments(seed, number, size, user_ids, post_ids):
+    rng = batch_rng(seed, 'comments', number)
+    return [
+        Comment(
+            post_id=rng.choice(post_ids),
+            author_id=rng.choice(user_ids),
+            text=random_text(rng, 6),
+        )
+        for _ in range(size)
+    ]
+
+
+@lru_cache(maxsize=4)
+def zipf_authors(seed, user_ids):
+    """Авторы в порядке популярности, одинаковом во всех воркерах."""
+    authors = list(user_ids)
+    batch_rng(seed, 'authors', 0).shuffle(authors)
+    return authors
+
+
+def build_follows(seed, number, size, user_ids, per_user):
+    """
+    Подписки пачки из size пользователей на per_user авторов. Авторы
+    выбираются по закону Ципфа: у немногих популярных тысячи
+    подписчиков, у большинства — единицы.
+    """
+    rng = batch_rng(seed, 'follows', number)
+    authors = zipf_authors(seed, user_ids)
+    weights = zipf_weights(len(authors))
+    first = number * size
+    return [
+        Follow(user_id=user_id, author_id=author_id)
+        for user_id in user_ids[first:first + size]
+        for author_id in sorted(set(
+            rng.choices(authors, cum_weights=weights, k=per_user)
+        ))
+        if author_id != user_id
+    ]
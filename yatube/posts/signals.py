@@ -0,0 +1,99 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core import tagged_cache
+
+from . import cache_tags, counters, feeds, search
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, update_fields=None,
+                      **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+    # Вход сохраняет только last_login, которого на страницах нет.
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    tagged_cache.invalidate(cache_tags.author(instance.pk))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def forget_changed_group(sender, instance, **kwargs):
+    tagged_cache.invalidate(cache_tags.group(instance.pk))
+
+
+@receiver(pre_save, sender=Post)
+def remember_saved_post(sender, instance, **kwargs):
+    if instance.pk:
+        instance._saved_group_id, instance._saved_text = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group_id', 'text').first() or (None, None)
+
+
+@receiver(post_save, sender=Post)
+def fanout_new_post(sender, instance, created, **kwargs):
+    if created:
+        feeds.fanout_post(instance)
+        search.index_post(instance, created=True)
+        tagged_cache.invalidate(*cache_tags.post_tags(instance))
+        counters.post_added(instance)
+        counters.shift_user_stats(instance.author_id, posts_count=1)
+        return
+    if instance._saved_text != instance.text:
+        search.index_post(instance)
+    # Текст поста виден во всех лентах, где он показывается, и в
+    # прежней группе, если её сменили.
+    tags = cache_tags.post_tags(instance)
+    if instance._saved_group_id != instance.group_id:
+        if instance._saved_group_id:
+            tags.append(cache_tags.group(instance._saved_group_id))
+        counters.post_regrouped(instance._saved_group_id, instance.group_id)
+    tagged_cache.invalidate(*tags)
+
+
+@receiver(post_delete, sender=Post)
+def forget_deleted_post(sender, instance, **kwargs):
+    tagged_cache.invalidate(*cache_tags.post_tags(instance))
+    counters.post_removed(instance)
+    counters.shift_user_stats(instance.author_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, **kwargs):
+    if created:
+        counters.shift_comments_count(instance.post_id, 1)
+        tagged_cache.invalidate(cache_tags.post(instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.shift_comments_count(instance.post_id, -1)
+    tagged_cache.invalidate(cache_tags.post(instance.post_id))
+
+
+@receiver(post_save, sender=Follow)
+def backfill_follow_timeline(sender, instance, created, **kwargs):
+    if created:
+        feeds.backfill_timeline(instance.user_id, instance.author_id)
+        counters.follow_changed(instance.user_id)
+        counters.shift_user_stats(instance.user_id, following_count=1)
+        counters.shift_user_stats(instance.author_id, followers_count=1)
+        tagged_cache.invalidate(
+            cache_tags.author(instance.user_id),
+            cache_tags.author(instance.author_id),
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def trim_follow_timeline(sender, instance, **kwargs):
+    feeds.trim_timeline(instance.user_id, instance.author_id)
+    counters.follow_changed(instance.user_id)
+    counters.shift_user_stats(instance.user_id, following_count=-1)
+    counters.shift_user_stats(instance.author_id, followers_count=-1)
+    feeds.resume_fanout(instance.author_id)
+    tagged_cache.invalidate(
+        cache_tags.author(instance.user_id),
+        cache_tags.author(instance.author_id),
+    )
@@ -0,0 +1,150 @@
+import time
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from ..models import Comment, Follow, Group, Post, UserStats
+from ..utils import QUANTUTY_POST_ON_PAGE
+
+User = get_user_model()
+
+
+def later(seconds=2):
+    """Запросы через несколько секунд после изменений."""
+    return mock.patch(
+        'posts.api.timezone.now',
+        return_value=timezone.now() + timedelta(seconds=seconds),
+    )
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='ApiAuthor')
+        cls.reader = User.objects.create_user(username='ApiReader')
+        cls.group = Group.objects.create(
+            title='Группа API', slug='api_slug', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {i}', author=cls.author, group=cls.group
+            )
+            for i in range(QUANTUTY_POST_ON_PAGE + 3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds_paginated_by_cursor(self):
+        """Ленты отдаются компактным JSON и листаются курсором."""
+        for url in (
+            reverse('api:index'),
+            reverse('api:group_list', args=(self.group.slug,)),
+            reverse('api:profile', args=(self.author.username,)),
+        ):
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                self.assertEqual(len(data['results']), QUANTUTY_POST_ON_PAGE)
+                self.assertEqual(data['results'][0]['text'], 'Пост 12')
+                self.assertEqual(data['results'][0]['group'], 'api_slug')
+                data = self.client.get(url, {'cursor': data['next']}).json()
+                self.assertEqual(
+                    [post['id'] for post in data['results']],
+                    [post.id for post in self.posts[2::-1]],
+                )
+        response = self.client.get(reverse('api:index'))
+        self.assertNotIn(b': ', response.content)
+
+    def test_unchanged_feed_is_not_modified(self):
+        """Неизменная лента отдаёт 304 без запросов к базе."""
+        url = reverse('api:index')
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 0)
+        Post.objects.create(text='Новый пост', author=self.author)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['text'], 'Новый пост')
+
+    def test_post_detail_with_comments_and_last_modified(self):
+        """Пост отдаётся с комментариями и Last-Modified."""
+        post = self.posts[0]
+        Comment.objects.create(post=post, author=self.reader, text='Ответ')
+        url = reverse('api:post_detail', args=(post.id,))
+        self.assertNotIn('Last-Modified', self.client.get(url))
+        with later():
+            response = self.client.get(url)
+            data = response.json()
+            self.assertEqual(data['comments_count'], 1)
+            self.assertEqual(data['comments']['results'][0]['text'], 'Ответ')
+            response = self.client.get(
+                url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+            )
+        self.assertEqual(response.status_code, 304)
+
+    def test_edit_and_delete_change_validators(self):
+        """Правка и удаление поста меняют ETag и Last-Modified лент."""
+        urls = (
+            reverse('api:index'),
+            reverse('api:group_list', args=(self.group.slug,)),
+            reverse('api:profile', args=(self.author.username,)),
+        )
+        started = time.time()
+        for offset, change in ((3, 'edit'), (6, 'delete')):
+            with later(offset - 1):
+                validators = [
+                    (response['ETag'], response['Last-Modified'])
+                    for response in map(self.client.get, urls)
+                ]
+            post = Post.objects.filter(author=self.author).first()
+            # Изменение через несколько секунд после первого ответа.
+            with mock.patch(
+                'core.tagged_cache.time.time', return_value=started + offset
+            ):
+                if change == 'edit':
+                    post.text = 'Новый текст'
+                    post.save()
+                else:
+                    post.delete()
+            with later(offset + 2):
+                for url, (etag, last_modified) in zip(urls, validators):
+                    with self.subTest(change=change, url=url):
+                        self.assertEqual(self.client.get(
+                            url, HTTP_IF_NONE_MATCH=etag
+                        ).status_code, 200)
+                        self.assertEqual(self.client.get(
+                            url, HTTP_IF_MODIFIED_SINCE=last_modified
+                        ).status_code, 200)
+
+    def test_profile_without_stats_row(self):
+        """Профиль без строки UserStats отдаёт посчитанные счётчики."""
+        UserStats.objects.filter(user=self.author).delete()
+        response = self.client.get(
+            reverse('api:profile', args=(self.author.username,))
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()['author']['posts_count'], len(self.posts)
+        )
+
+    def test_follow_feed_requires_login(self):
+        """Лента подписок отдаётся только вошедшему пользователю."""
+        url = reverse('api:follow_index')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        Follow.objects.create(user=self.reader, author=self.author)
+        client = Client()
+        client.force_login(self.reader)
+        response = client.get(url)
+        self.assertEqual(
+            len(response.json()['results']), QUANTUTY_POST_ON_PAGE
+        )
+        response = client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
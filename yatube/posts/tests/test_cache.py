@@ -0,0 +1,120 @@
+from django.contrib.auth import get_user_model
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+from core import tagged_cache
+from core.cache import TwoLevelCache
+from .. import cache_tags
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class TaggedCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='CacheAuthor')
+        cls.group = Group.objects.create(
+            title='Группа кеша',
+            slug='cache-group',
+            description='Описание',
+        )
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_value_lives_until_tag_is_invalidated(self):
+        """Значение читается из кеша, пока не сброшен один из его тегов."""
+        tagged_cache.get_or_set('answer', 1, ['a', 'b'])
+        self.assertEqual(tagged_cache.get_or_set('answer', 2, ['a', 'b']), 1)
+        tagged_cache.invalidate('b')
+        self.assertEqual(tagged_cache.get_or_set('answer', 3, ['a', 'b']), 3)
+
+    def test_two_level_cache_bounds_local_copies(self):
+        """L1 хранит не больше заданного числа ключей и не держит версии."""
+        two_level = TwoLevelCache('', {'OPTIONS': {'L1_MAX_ENTRIES': 2}})
+        two_level.l2 = LocMemCache('two-level-test', {})
+        for key in ('a', 'b', 'c', 'tag:x'):
+            two_level.set(key, key)
+        self.assertEqual(list(two_level._l1), ['b', 'c'])
+        self.assertEqual(two_level.get_many(['a', 'c', 'tag:x']), {
+            'a': 'a', 'c': 'c', 'tag:x': 'tag:x',
+        })
+        self.assertEqual(two_level.stats['l1'], 1)
+
+    def test_feeds_follow_post_changes(self):
+        """Ленты сразу показывают новый, перенесённый и удалённый пост."""
+        group_url = reverse('posts:group_list', args=(self.group.slug,))
+        profile_url = reverse('posts:profile', args=(self.author.username,))
+        for url in (group_url, profile_url):
+            self.client.get(url)
+        post = Post.objects.create(
+            text='Пост с тегами', author=self.author, group=self.group
+        )
+        for url in (group_url, profile_url):
+            self.assertIn(post, self.client.get(url).context['page_obj'])
+        post.group = None
+        post.save()
+        self.assertNotIn(
+            post, self.client.get(group_url).context['page_obj']
+        )
+        post.delete()
+        self.assertNotIn(
+            post, self.client.get(profile_url).context['page_obj']
+        )
+
+    def test_comments_fragment_follows_new_comment(self):
+        """Новый комментарий сбрасывает кеш комментариев поста."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        url = reverse('posts:post_detail', args=(post.id,))
+        self.client.get(url)
+        Comment.objects.create(
+            post=post, author=self.author, text='Свежий комментарий'
+        )
+        self.assertContains(self.client.get(url), 'Свежий комментарий')
+
+    def test_post_cards_follow_author_and_group_changes(self):
+        """Карточка поста показывает новое имя автора и адрес группы."""
+        Post.objects.create(
+            text='Пост в карточке', author=self.author, group=self.group
+        )
+        index_url = reverse('posts:index')
+        self.client.get(index_url)
+        self.author.first_name = 'Новое'
+        self.author.last_name = 'Имя'
+        self.author.save()
+        self.group.slug = 'renamed-cache-group'
+        self.group.save()
+        content = self.client.get(index_url).content.decode()
+        self.assertIn('Новое Имя', content)
+        self.assertIn(
+            reverse('posts:group_list', args=('renamed-cache-group',)),
+            content,
+        )
+
+    def test_login_keeps_author_tag(self):
+        """Вход пользователя не сбрасывает закешированное по автору."""
+        version = tagged_cache.version(cache_tags.author(self.author.pk))
+        self.author.set_password('password')
+        self.author.save()
+        self.assertNotEqual(
+            tagged_cache.version(cache_tags.author(self.author.pk)), version
+        )
+        version = tagged_cache.version(cache_tags.author(self.author.pk))
+        self.client.login(username=self.author.username, password='password')
+        self.assertEqual(
+            tagged_cache.version(cache_tags.author(self.author.pk)), version
+        )
+
+
+class TaggedCacheCommitTests(TransactionTestCase):
+    def test_invalidate_again_after_commit(self):
+        """Значение, собранное до коммита, не читается после него."""
+        with transaction.atomic():
+            tagged_cache.invalidate('commit-tag')
+            tagged_cache.get_or_set('stale', 'старое', ['commit-tag'])
+        self.assertEqual(
+            tagged_cache.get_or_set('stale', 'новое', ['commit-tag']), 'новое'
+        )
@@ -0,0 +1,70 @@
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+from core.transactions import write_atomic
+
+User = get_user_model()
+
+
+def pragma(name):
+    with connection.cursor() as cursor:
+        cursor.execute(f'PRAGMA {name}')
+        return cursor.fetchone()[0]
+
+
+class SQLiteBackendTests(TestCase):
+    def test_connection_pragmas(self):
+        """Прагмы из настроек ставятся на соединение."""
+        self.assertEqual(pragma('synchronous'), 1)
+        self.assertEqual(pragma('busy_timeout'), 5000)
+        self.assertEqual(pragma('temp_store'), 2)
+        self.assertEqual(pragma('cache_size'), -64 * 2 ** 10)
+        self.assertEqual(pragma('foreign_keys'), 1)
+
+
+class SQLiteTransactionTests(TransactionTestCase):
+    def statements(self, action):
+        statements = []
+
+        def remember(execute, sql, params, many, context):
+            statements.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(remember):
+            action()
+        return statements
+
+    def begin_statement(self, block):
+        def run():
+            with block():
+                pragma('user_version')
+        return self.statements(run)[0]
+
+    def test_atomic_begins_deferred(self):
+        """transaction.atomic не берёт блокировку записи заранее."""
+        self.assertEqual(
+            self.begin_statement(transaction.atomic), 'BEGIN DEFERRED'
+        )
+
+    def test_write_atomic_begins_immediate(self):
+        """write_atomic открывает транзакцию BEGIN IMMEDIATE."""
+        self.assertEqual(
+            self.begin_statement(write_atomic), 'BEGIN IMMEDIATE'
+        )
+        with transaction.atomic(), write_atomic():
+            pragma('user_version')
+        self.assertIsNone(connection.begin_mode)
+
+    def test_only_writes_begin_immediate(self):
+        """Форма открывается без транзакции, сохранение — с IMMEDIATE."""
+        client = Client()
+        client.force_login(User.objects.create_user(username='Writer'))
+        url = reverse('posts:post_create')
+        self.assertFalse([
+            sql for sql in self.statements(lambda: client.get(url))
+            if sql.startswith('BEGIN')
+        ])
+        self.assertIn('BEGIN IMMEDIATE', self.statements(
+            lambda: client.post(url, {'text': 'Пост'})
+        ))
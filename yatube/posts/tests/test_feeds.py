@@ -0,0 +1,77 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from ..models import Follow, Post, Timeline
+
+User = get_user_model()
+
+
+class FollowFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='FeedAuthor')
+        cls.reader = User.objects.create_user(username='FeedReader')
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_new_post_fanned_out_to_followers(self):
+        """Новый пост автора попадает в ленту подписчика."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Пост для ленты', author=self.author)
+        self.assertTrue(
+            Timeline.objects.filter(user=self.reader, post=post).exists()
+        )
+
+    def test_follow_backfills_and_unfollow_trims_timeline(self):
+        """Подписка заполняет ленту, отписка очищает её."""
+        post = Post.objects.create(text='Старый пост', author=self.author)
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=(self.author.username,))
+        )
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'])
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', args=(self.author.username,))
+        )
+        self.assertFalse(Timeline.objects.filter(user=self.reader).exists())
+
+    @override_settings(FEED_FANOUT_LIMIT=0)
+    def test_popular_author_read_on_request(self):
+        """Посты популярного автора подмешиваются в ленту при чтении."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Популярный пост', author=self.author)
+        self.assertFalse(Timeline.objects.filter(post=post).exists())
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'])
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_popular_author_post_updates_feed_count(self):
+        """Новый пост популярного автора сразу учтён в счётчике ленты."""
+        cache.clear()
+        Follow.objects.create(
+            user=User.objects.create_user(username='FeedFan'),
+            author=self.author,
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.create(text='Первый пост', author=self.author)
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'].paginator.count, 1)
+        Post.objects.create(text='Второй пост', author=self.author)
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'].paginator.count, 2)
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_author_below_limit_again_keeps_posts_in_feed(self):
+        """Посты, вышедшие, пока автор был популярен, остаются в ленте."""
+        fan = User.objects.create_user(username='FeedLeaving')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=fan, author=self.author)
+        post = Post.objects.create(text='Популярный пост', author=self.author)
+        self.assertFalse(Timeline.objects.filter(post=post).exists())
+        Follow.objects.get(user=fan, author=self.author).delete()
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'])
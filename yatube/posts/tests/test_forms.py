@@ -2,9 +2,12 @@ from http import HTTPStatus
 from django.contrib.auth import get_user_model
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from ..forms import PostForm
 from ..models import Group, Post, Comment
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
+from io import BytesIO
+from PIL import Image
 import shutil
 import tempfile
 
@@ -13,7 +16,7 @@ User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_THUMBNAIL_WORKERS=0)
 class PostFormTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -74,7 +77,7 @@ class PostFormTests(TestCase):
         self.assertEqual(post.text, form_data['text'])
         self.assertEqual(post.author, self.author_post)
         self.assertEqual(post.group_id, form_data['group'])
-        self.assertEqual(post.image.name, 'posts/small.gif')
+        self.assertRegex(post.image.name, r'^posts/[0-9a-f]{32}\.gif$')
 
     def test_authorized_user_can_edit_post(self):
         """Проверка редактирования записи авторизированным пользователем."""
@@ -104,6 +107,68 @@ class PostFormTests(TestCase):
         self.assertTrue(post.author, self.author_post)
         self.assertTrue(post.group_id, form_data['group'])
 
+    @staticmethod
+    def image_upload(name, image_format, **options):
+        buffer = BytesIO()
+        frames = options.pop('frames', 1)
+        images = [
+            Image.new('RGB', options.pop('size', (4, 4)), (index * 60, 0, 0))
+            for index in range(frames)
+        ]
+        images[0].save(
+            buffer, image_format, save_all=frames > 1,
+            append_images=images[1:], **options
+        )
+        return SimpleUploadedFile(name, buffer.getvalue())
+
+    @override_settings(POST_IMAGE_MAX_BYTES=100)
+    def test_too_large_file_rejected_before_decoding(self):
+        """Файл больше лимита отклоняется с ошибкой поля image."""
+        form = PostForm(
+            data={'text': 'Пост'},
+            files={'image': self.image_upload(
+                'big.png', 'PNG', size=(200, 200)
+            )},
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100)
+    def test_too_many_pixels_rejected(self):
+        """Картинка с числом пикселей больше лимита отклоняется."""
+        form = PostForm(
+            data={'text': 'Пост'},
+            files={'image': self.image_upload(
+                'wide.png', 'PNG', size=(20, 20)
+            )},
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+
+    def test_upload_is_reencoded_without_metadata(self):
+        """EXIF снимается, кадры анимированного GIF сохраняются."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Камера'
+        form = PostForm(
+            data={'text': 'Пост'},
+            files={'image': self.image_upload('photo.jpg', 'JPEG', exif=exif)},
+        )
+        self.assertTrue(form.is_valid())
+        with Image.open(form.cleaned_data['image']) as image:
+            self.assertNotIn('exif', image.info)
+        form = PostForm(
+            data={'text': 'Пост'},
+            files={'image': self.image_upload(
+                'anim.gif', 'GIF', frames=3, duration=50, loop=0,
+                comment=b'secret',
+            )},
+        )
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.cleaned_data['image'].name, 'anim.gif')
+        with Image.open(form.cleaned_data['image']) as image:
+            self.assertEqual(image.n_frames, 3)
+            self.assertNotIn('comment', image.info)
+
 
 class CommentFormTests(TestCase):
     @classmethod
@@ -0,0 +1,235 @@
+import gzip
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.files.storage import FileSystemStorage
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail import default
+from ..models import Post
+from .. import thumbnails
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_THUMBNAIL_WORKERS=0)
+class ContentAddressedMediaTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='MediaAuthor')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp(dir=TEMP_MEDIA_ROOT)
+        media_settings = override_settings(
+            MEDIA_ROOT=self.media_root, POST_THUMBNAIL_WORKERS=0
+        )
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+
+    def test_same_upload_stored_once(self):
+        """Одинаковые загрузки получают одно имя и один файл."""
+        posts = [
+            Post.objects.create(
+                text='Пост',
+                author=self.author,
+                image=ContentFile(SMALL_GIF, name=name),
+            )
+            for name in ('first.gif', 'second.gif')
+        ]
+        self.assertEqual(posts[0].image.name, posts[1].image.name)
+        self.assertEqual(
+            os.listdir(os.path.join(self.media_root, 'posts')),
+            [os.path.basename(posts[0].image.name)],
+        )
+
+    def test_dedupe_media_merges_legacy_copies(self):
+        """Команда сводит старые копии к одному файлу по хешу."""
+        legacy = FileSystemStorage(location=self.media_root)
+        posts = [
+            Post.objects.create(
+                text='Старый пост',
+                author=self.author,
+                image=legacy.save(name, ContentFile(SMALL_GIF)),
+            )
+            for name in ('posts/legacy.gif', 'posts/legacy_copy.gif')
+        ]
+        url = reverse('posts:post_detail', args=(posts[1].id,))
+        etag = self.client.get(url)['ETag']
+        call_command('dedupe_media', stdout=StringIO())
+        for post in posts:
+            post.refresh_from_db()
+        self.assertEqual(posts[0].image.name, posts[1].image.name)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(posts[0].image.storage.exists(posts[0].image.name))
+        for name in ('legacy.gif', 'legacy_copy.gif'):
+            self.assertFalse(legacy.exists(f'posts/{name}'))
+
+    def test_gc_media_removes_only_unreferenced_files(self):
+        """GC удаляет брошенные картинки и миниатюры, живые оставляет."""
+        cache.clear()
+        kept, dropped = [
+            Post.objects.create(
+                text='Пост',
+                author=self.author,
+                image=ContentFile(content, name='gc.gif'),
+            )
+            for content in (SMALL_GIF, SMALL_GIF.replace(b'\xFF', b'\xFE'))
+        ]
+        for post in (kept, dropped):
+            thumbnails.generate(post.image.name)
+        dropped_name = dropped.image.name
+        geometry, options = thumbnails.POST_THUMBNAILS[thumbnails.CARD]
+        dropped_thumbnail = thumbnails.thumbnail_file(
+            dropped_name, geometry, **options
+        ).name
+        dropped.delete()
+        stray = default.storage.save(
+            'cache/00/00/stray.jpg', ContentFile(b'x')
+        )
+        storage = kept.image.storage
+        call_command(
+            'gc_media', '--dry-run', '--grace-period', '0', stdout=StringIO()
+        )
+        self.assertTrue(storage.exists(dropped_name))
+        call_command('gc_media', '--grace-period', '0', stdout=StringIO())
+        self.assertFalse(storage.exists(dropped_name))
+        self.assertFalse(default.storage.exists(dropped_thumbnail))
+        self.assertFalse(default.storage.exists(stray))
+        self.assertTrue(storage.exists(kept.image.name))
+        self.assertTrue(thumbnails.is_generated(kept.image.name))
+
+    def test_gc_media_keeps_reuploaded_orphan(self):
+        """Снова загруженная брошенная картинка переживает GC."""
+        cache.clear()
+        post = Post.objects.create(
+            text='Пост', author=self.author,
+            image=ContentFile(SMALL_GIF, name='old.gif'),
+        )
+        thumbnails.generate(post.image.name)
+        name, storage = post.image.name, post.image.storage
+        post.delete()
+        # Картинка и миниатюры брошены давно, старше --grace-period.
+        day_ago = time.time() - 24 * 60 * 60
+        for root, _, files in os.walk(self.media_root):
+            for file in files:
+                os.utime(os.path.join(root, file), (day_ago, day_ago))
+        self.assertEqual(
+            storage.save('posts/new.gif', ContentFile(SMALL_GIF)), name
+        )
+        call_command('gc_media', stdout=StringIO())
+        self.assertTrue(storage.exists(name))
+        self.assertTrue(thumbnails.is_generated(name))
+        call_command('gc_media', '--grace-period', '0', stdout=StringIO())
+        self.assertFalse(storage.exists(name))
+
+    def test_media_served_with_validators_and_ranges(self):
+        """Картинка поста отдаётся с ETag, 304 и частями по Range."""
+        post = Post.objects.create(
+            text='Пост',
+            author=self.author,
+            image=ContentFile(SMALL_GIF, name='served.gif'),
+        )
+        url = post.image.url
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), SMALL_GIF)
+        etag = response['ETag']
+        self.assertIn(etag.strip('"'), post.image.name)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('Last-Modified', response)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        response = self.client.get(url, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(
+            response['Content-Range'], f'bytes 2-5/{len(SMALL_GIF)}'
+        )
+        self.assertEqual(b''.join(response.streaming_content), SMALL_GIF[2:6])
+        response = self.client.get(
+            url, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"stale"'
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(url, HTTP_RANGE='bytes=1000-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_unhashed_media_revalidated(self):
+        """Файл со старым именем получает ETag по содержимому."""
+        FileSystemStorage(location=self.media_root).save(
+            'posts/legacy.gif', ContentFile(SMALL_GIF)
+        )
+        response = self.client.get('/media/posts/legacy.gif')
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+        response = self.client.get(
+            '/media/posts/legacy.gif', HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(
+            self.client.get('/media/../settings.py').status_code, 404
+        )
+
+    @override_settings(SENDFILE_MODE='x-accel-redirect')
+    def test_media_sendfile_mode(self):
+        """В режиме X-Accel-Redirect тело отдаёт веб-сервер."""
+        post = Post.objects.create(
+            text='Пост',
+            author=self.author,
+            image=ContentFile(SMALL_GIF, name='accel.gif'),
+        )
+        response = self.client.get(post.image.url)
+        self.assertEqual(
+            response['X-Accel-Redirect'], f'/internal-media/{post.image.name}'
+        )
+        self.assertEqual(response.content, b'')
+        self.assertIn('ETag', response)
+
+    def test_collected_static_hashed_and_precompressed(self):
+        """Статика после collectstatic: хеш в имени и сжатая копия."""
+        with override_settings(STATIC_ROOT=self.media_root + '_static'):
+            self.addCleanup(
+                shutil.rmtree, settings.STATIC_ROOT, ignore_errors=True
+            )
+            call_command('collectstatic', interactive=False, verbosity=0)
+            url = staticfiles_storage.url('css/bootstrap.min.css')
+            self.assertRegex(url, r'bootstrap\.min\.[0-9a-f]{12}\.css$')
+            self.assertContains(self.client.get('/'), url)
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, br')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(response['Content-Type'], 'text/css')
+            self.assertIn('immutable', response['Cache-Control'])
+            self.assertEqual(response['Vary'], 'Accept-Encoding')
+            body = b''.join(response.streaming_content)
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='identity')
+            self.assertNotIn('Content-Encoding', response)
+            self.assertEqual(
+                gzip.decompress(body), b''.join(response.streaming_content)
+            )
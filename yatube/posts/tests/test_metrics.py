@@ -0,0 +1,79 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from core import metrics
+from ..models import Post
+
+User = get_user_model()
+
+
+class ViewMetricsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='MetricsAuthor')
+        cls.post = Post.objects.create(author=author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+    def test_view_metrics_exposed_as_histograms(self):
+        """Запросы к view попадают в гистограммы по имени view."""
+        for _ in range(2):
+            self.client.get(reverse('posts:index'))
+        index = metrics.views['posts:index']
+        self.assertEqual(index.counters['requests'], 2)
+        self.assertGreater(index.histograms['queries'].sum, 0)
+        self.assertGreater(index.histograms['template_seconds'].sum, 0)
+        self.assertGreater(index.counters['cache_hits'], 0)
+        self.assertGreater(index.counters['cache_misses'], 0)
+        with self.settings(METRICS_ALLOWED_IPS=['10.0.0.2']):
+            response = self.client.get(
+                reverse('metrics'), REMOTE_ADDR='10.0.0.2'
+            )
+        self.assertContains(
+            response,
+            'yatube_view_queries_bucket{view="posts:index",le="+Inf"} 2',
+        )
+        self.assertContains(
+            response, 'yatube_view_requests_total{view="posts:index"} 2'
+        )
+
+    def test_fragment_cache_counted(self):
+        """Фрагменты {% cache %} учитываются в попаданиях и промахах."""
+        url = reverse('posts:post_detail', args=(self.post.id,))
+        self.client.get(url)
+        detail = metrics.views['posts:post_detail']
+        self.assertGreater(detail.counters['cache_misses'], 0)
+        self.assertEqual(detail.counters['cache_hits'], 0)
+        self.client.get(url)
+        self.assertGreater(detail.counters['cache_hits'], 0)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_require_token_by_default(self):
+        """Без токена /metrics/ закрыт и для локальных адресов."""
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(
+            self.client.get(
+                url, HTTP_AUTHORIZATION='Bearer wrong'
+            ).status_code,
+            404,
+        )
+        self.assertEqual(
+            self.client.get(
+                url, HTTP_AUTHORIZATION='Bearer secret'
+            ).status_code,
+            200,
+        )
+
+    @override_settings(VIEW_BUDGETS={'posts:index': {'queries': 0}})
+    def test_request_over_budget_logged(self):
+        """Запрос сверх бюджета view пишется в лог."""
+        with self.assertLogs('core.middleware', 'WARNING') as logs:
+            self.client.get(reverse('posts:index'))
+        self.assertIn('posts:index', logs.output[0])
+        self.assertIn('queries', logs.output[0])
@@ -0,0 +1,99 @@
+from urllib.parse import urlencode
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from core.stemming import stem
+from ..models import Post, PostTerm
+from ..search import search_posts
+from .. import views
+
+User = get_user_model()
+
+
+class PostSearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='SearchAuthor')
+
+    def test_stemmer_joins_word_forms(self):
+        """Разные формы слова сводятся к одной основе."""
+        for forms in (
+            ('котик', 'котики', 'котиками'),
+            ('красивая', 'красивые', 'красивыми'),
+            ('программирование', 'программированием'),
+        ):
+            self.assertEqual(len({stem(word) for word in forms}), 1, forms)
+
+    def test_search_finds_word_forms_and_ranks(self):
+        """Поиск находит формы слова, чаще упомянутое выше."""
+        once = Post.objects.create(
+            text='Мой котик спит', author=self.author
+        )
+        often = Post.objects.create(
+            text='Котики, котики и ещё раз котиками', author=self.author
+        )
+        Post.objects.create(text='Про собак', author=self.author)
+        self.assertEqual(list(search_posts('котиков')), [often, once])
+        self.assertEqual(list(search_posts('котик спит')), [once])
+        self.assertEqual(list(search_posts('и')), [])
+
+    def test_index_follows_edit_and_delete(self):
+        """Правка и удаление поста сразу видны в индексе."""
+        post = Post.objects.create(text='Старые слова', author=self.author)
+        post.text = 'Новые слова'
+        post.save()
+        self.assertEqual(list(search_posts('старые')), [])
+        self.assertEqual(list(search_posts('новое')), [post])
+        post.delete()
+        self.assertFalse(PostTerm.objects.exists())
+
+    def test_search_page_paginated_by_cursor(self):
+        """Страница поиска листается курсором с сохранением запроса."""
+        posts = [
+            Post.objects.create(text=f'Заметка {number}', author=self.author)
+            for number in range(views.QUANTUTY_POST_ON_PAGE + 2)
+        ]
+        url = reverse('posts:search')
+        response = self.client.get(url, {'q': 'заметки'})
+        page_obj = response.context['page_obj']
+        self.assertEqual(len(page_obj), views.QUANTUTY_POST_ON_PAGE)
+        self.assertContains(
+            response, f'?{urlencode({"q": "заметки"})}&amp;cursor='
+        )
+        response = self.client.get(
+            url, {'q': 'заметки', 'cursor': page_obj.next_cursor}
+        )
+        self.assertEqual(
+            list(response.context['page_obj']), posts[1::-1]
+        )
+
+    def test_search_cursor_keeps_scores(self):
+        """Новые посты между страницами не сбивают курсор поиска."""
+        posts = [
+            Post.objects.create(text=f'Заметка {number}', author=self.author)
+            for number in range(views.QUANTUTY_POST_ON_PAGE + 2)
+        ]
+        url = reverse('posts:search')
+        page_obj = self.client.get(url, {'q': 'заметки'}).context['page_obj']
+        for number in range(5):
+            Post.objects.create(text=f'Про собак {number}', author=self.author)
+        response = self.client.get(
+            url, {'q': 'заметки', 'cursor': page_obj.next_cursor}
+        )
+        self.assertEqual(
+            list(response.context['page_obj']), posts[1::-1]
+        )
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт по индексу и понимает формы слов."""
+        post = Post.objects.create(
+            text='Интересные заметки', author=self.author
+        )
+        admin = User.objects.create_superuser('SearchAdmin', '', 'pass')
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'интересная'}
+        )
+        self.assertEqual(list(response.context['cl'].result_list), [post])
@@ -0,0 +1,50 @@
+from io import StringIO
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase
+from core import tagged_cache
+from .. import cache_tags
+from ..models import Follow, Post, PostTerm, Timeline, User, UserStats
+
+
+class SeedDataTests(TestCase):
+    def seed(self, workers):
+        call_command(
+            'seed_data', '--users', '20', '--groups', '3', '--posts', '50',
+            '--comments', '40', '--follows-per-user', '5',
+            '--batch-size', '16', '--workers', str(workers),
+            stdout=StringIO(),
+        )
+
+    def test_seed_data_is_deterministic(self):
+        """Один seed даёт одни данные при любом числе воркеров."""
+        with transaction.atomic():
+            self.seed(0)
+            texts = list(Post.objects.values_list(
+                'author__username', 'group__slug', 'text'
+            ).order_by('id'))
+            transaction.set_rollback(True)
+        self.seed(2)
+        self.assertEqual(len(texts), 50)
+        self.assertEqual(texts, list(Post.objects.values_list(
+            'author__username', 'group__slug', 'text'
+        ).order_by('id')))
+
+    def test_seed_data_fills_derived_tables(self):
+        """После посева готовы счётчики, ленты подписок и индекс поиска."""
+        self.seed(0)
+        self.assertEqual(UserStats.objects.count(), 20)
+        self.assertTrue(Follow.objects.exists())
+        self.assertTrue(Timeline.objects.exists())
+        self.assertEqual(
+            PostTerm.objects.values('post').distinct().count(), 50
+        )
+
+    def test_seed_data_reruns_with_same_seed(self):
+        """Повторный посев с тем же seed добавляет данные и сбрасывает кеш."""
+        self.seed(0)
+        etag = tagged_cache.etag(cache_tags.INDEX)
+        self.seed(0)
+        self.assertEqual(User.objects.count(), 40)
+        self.assertEqual(Post.objects.count(), 100)
+        self.assertNotEqual(tagged_cache.etag(cache_tags.INDEX), etag)
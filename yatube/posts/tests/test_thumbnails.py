@@ -0,0 +1,101 @@
+import shutil
+import tempfile
+from io import BytesIO
+from PIL import Image
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail import get_thumbnail
+from ..models import Post
+from .. import thumbnails
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_THUMBNAIL_WORKERS=0)
+class ThumbnailsTests(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='ThumbAuthor')
+        self.client = Client()
+        self.client.force_login(self.author)
+
+    @staticmethod
+    def gif(color):
+        buffer = BytesIO()
+        Image.new('RGB', (2, 1), (color, 0, 0)).save(buffer, 'GIF')
+        return buffer.getvalue()
+
+    def test_created_post_gets_thumbnails(self):
+        """Миниатюры нового поста строятся сразу после сохранения формы."""
+        self.client.post(reverse('posts:post_create'), data={
+            'text': 'Пост с картинкой',
+            'image': SimpleUploadedFile('thumb.gif', SMALL_GIF, 'image/gif'),
+        })
+        post = Post.objects.get()
+        self.assertTrue(thumbnails.is_generated(post.image.name))
+
+    def test_thumbnail_file_matches_sorl(self):
+        """Имя миниатюры вычисляется так же, как в теге {% thumbnail %}."""
+        post = Post.objects.create(
+            text='Пост',
+            author=self.author,
+            image=SimpleUploadedFile('match.gif', SMALL_GIF, 'image/gif'),
+        )
+        geometry, options = thumbnails.POST_THUMBNAILS[thumbnails.CARD]
+        self.assertEqual(
+            thumbnails.thumbnail_file(
+                post.image.name, geometry, **options
+            ).name,
+            get_thumbnail(post.image, geometry, **options).name,
+        )
+
+    def test_attach_urls_resolves_page_in_one_query(self):
+        """Адреса миниатюр страницы берутся одним запросом к KV store."""
+        posts = [
+            Post.objects.create(
+                text=f'Пост {number}',
+                author=self.author,
+                image=SimpleUploadedFile(
+                    f'page{number}.gif', self.gif(number), 'image/gif'
+                ),
+            )
+            for number in range(3)
+        ]
+        for post in posts[:2]:
+            thumbnails.generate(post.image.name)
+        cache.clear()
+        with self.assertNumQueries(1):
+            thumbnails.attach_urls(posts)
+        geometry, options = thumbnails.POST_THUMBNAILS[thumbnails.CARD]
+        self.assertEqual(
+            posts[0].thumbnail_url,
+            get_thumbnail(posts[0].image, geometry, **options).url,
+        )
+        self.assertIn('480w', posts[0].thumbnail_srcset)
+        if 'WEBP' in thumbnails.CARD_FORMATS:
+            self.assertIn('.webp 960w', posts[0].thumbnail_webp_srcset)
+        else:
+            self.assertEqual(posts[0].thumbnail_webp_srcset, '')
+        self.assertFalse(hasattr(posts[2], 'thumbnail_url'))
+        with self.assertNumQueries(0):
+            thumbnails.attach_urls(posts)
@@ -1,13 +1,18 @@
+import base64
+import json
 from django.contrib.auth import get_user_model
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
-from ..models import Group, Post, Follow
+from ..models import Comment, Group, Post, Follow
+from ..views import COMMENTS_ON_PAGE
 from django import forms
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 import tempfile
 import shutil
 from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 
 User = get_user_model()
@@ -15,7 +20,7 @@ User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_THUMBNAIL_WORKERS=0)
 class ViewTemplatesTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -190,16 +195,18 @@ class ViewTemplatesTests(TestCase):
         post = Post.objects.create(
             text='Пост для теста кеша',
             author=self.user)
-        add_content = self.authorized_client.get(
-            reverse('posts:index')).content
+        self.assertContains(
+            self.authorized_client.get(reverse('posts:index')), post.text)
+        Post.objects.filter(pk=post.pk).update(text='Текст в обход кеша')
+        self.assertContains(
+            self.authorized_client.get(reverse('posts:index')), post.text)
+        post.text = 'Отредактированный пост'
+        post.save()
+        self.assertContains(
+            self.authorized_client.get(reverse('posts:index')), post.text)
         post.delete()
-        delete_content = self.authorized_client.get(
-            reverse('posts:index')).content
-        self.assertEqual(add_content, delete_content)
-        cache.clear()
-        clear_cache_content = self.authorized_client.get(
-            reverse('posts:index')).content
-        self.assertNotEqual(add_content, clear_cache_content)
+        self.assertNotContains(
+            self.authorized_client.get(reverse('posts:index')), post.text)
 
     def test_authorized_user_can_follow_other_user(self):
         """
@@ -303,3 +310,281 @@ class PaginatorViewsTest(TestCase):
                     page_2.context['page_obj']),
                     4
                 )
+
+    @override_settings(POSTS_PAGINATION='cursor')
+    def test_cursor_paginator_walks_feed_both_ways(self):
+        """Курсорная пагинация листает ленту вперёд и назад без пропусков."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Пост {i}', group=self.group)
+            for i in range(14)
+        )
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        page_1 = self.authorized_client.get(url).context['page_obj']
+        self.assertEqual(len(page_1), 10)
+        self.assertFalse(page_1.has_previous())
+        page_2 = self.authorized_client.get(
+            url, {'cursor': page_1.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(page_2), 4)
+        self.assertFalse(page_2.has_next())
+        self.assertFalse(set(page_1) & set(page_2))
+        back = self.authorized_client.get(
+            url, {'cursor': page_2.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(back), list(page_1))
+
+    def test_malformed_cursor_opens_first_page(self):
+        """Курсор с чужими типами значений открывает первую страницу."""
+        post = Post.objects.create(
+            author=self.user, text='Заметка', group=self.group
+        )
+        urls = (
+            (reverse('api:index'), {}),
+            (reverse('posts:post_comments', args=(post.id,)), {}),
+            (reverse('posts:search'), {'q': 'заметка'}),
+        )
+        payloads = (
+            ['next', '2024-13-01T00:00:00+00:00', 1],
+            ['next', 5, 1],
+            ['next', ['2024'], 1],
+            ['next', '2024-01-01T00:00:00+00:00', '1'],
+            ['next', '2024-01-01T00:00:00+00:00', [1]],
+            ['next', '2024-01-01T00:00:00+00:00', 2 ** 70],
+            ['next', 1.5, 1],
+            ['prev', 'NaN', 1],
+            'cursor',
+        )
+        for url, params in urls:
+            for payload in payloads:
+                cursor = base64.urlsafe_b64encode(
+                    json.dumps(payload).encode()
+                ).decode()
+                with self.subTest(url=url, payload=payload):
+                    response = self.authorized_client.get(
+                        url, {**params, 'cursor': cursor}
+                    )
+                    self.assertEqual(response.status_code, 200)
+
+    def test_paginator_count_comes_from_feed_counter(self):
+        """Число постов в ленте группы берётся из счётчика в кеше."""
+        for i in range(3):
+            Post.objects.create(
+                author=self.user, text=f'Пост {i}', group=self.group
+            )
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        response = self.authorized_client.get(url)
+        self.assertEqual(response.context['page_obj'].paginator.count, 3)
+        Post.objects.create(author=self.user, text='Ещё', group=self.group)
+        Post.objects.filter(text='Пост 0').delete()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(url)
+        self.assertEqual(response.context['page_obj'].paginator.count, 3)
+        self.assertFalse(
+            [query for query in queries if 'COUNT(' in query['sql']]
+        )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_THUMBNAIL_WORKERS=0)
+class FeedQueryBudgetTests(TestCase):
+    FEED_QUERY_BUDGET = 5
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='BudgetReader')
+        cls.group = Group.objects.create(
+            title='Группа для проверки запросов',
+            slug='budget_slug',
+            description='Описание группы',
+        )
+        small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x02\x00'
+            b'\x01\x00\x80\x00\x00\x00\x00\x00'
+            b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+            b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+            b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+            b'\x0A\x00\x3B'
+        )
+        for i in range(10):
+            author = User.objects.create_user(username=f'BudgetAuthor{i}')
+            Follow.objects.create(user=cls.reader, author=author)
+            Post.objects.create(
+                author=author,
+                text=f'Пост {i}',
+                group=cls.group,
+                image=SimpleUploadedFile(
+                    name=f'budget_{i}.gif',
+                    content=small_gif,
+                    content_type='image/gif',
+                ),
+            )
+        cls.author = author
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+        cache.clear()
+
+    def test_feed_pages_fit_query_budget(self):
+        """Страница ленты из 10 постов укладывается в бюджет запросов."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            self.authorized_client.get(url)
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    self.authorized_client.get(url)
+                self.assertLessEqual(len(queries), self.FEED_QUERY_BUDGET)
+
+
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='CommentedAuthor')
+        cls.post = Post.objects.create(author=author, text='Обсуждаемый пост')
+        for i in range(COMMENTS_ON_PAGE + 5):
+            Comment.objects.create(
+                post=cls.post,
+                author=User.objects.create_user(username=f'Commenter{i}'),
+                text=f'Комментарий {i}',
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_detail_renders_latest_comments_page(self):
+        """Пост показывает последние комментарии без запроса на автора."""
+        url = reverse('posts:post_detail', args=(self.post.id,))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertLessEqual(len(queries), 3)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_ON_PAGE)
+        self.assertEqual(
+            comments[0].text, f'Комментарий {COMMENTS_ON_PAGE + 4}'
+        )
+        self.assertContains(response, 'data-more-comments')
+
+        response = self.client.get(
+            reverse('posts:post_comments', args=(self.post.id,)),
+            {'cursor': comments.next_cursor},
+        )
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            [f'Комментарий {i}' for i in range(4, -1, -1)],
+        )
+        self.assertNotContains(response, 'data-more-comments')
+
+
+class ConditionalPagesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='EtagAuthor')
+        cls.reader = User.objects.create_user(username='EtagReader')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def assertNotModified(self, client, url, etag):
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(response.templates)
+
+    def test_unchanged_index_not_rendered(self):
+        """Неизменная главная отдаёт 304 без шаблона и запросов."""
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            self.assertNotModified(self.client, url, etag)
+        self.assertEqual(len(queries), 0)
+        self.assertNotEqual(self.reader_client.get(url)['ETag'], etag)
+        Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
+
+    def test_relogin_changes_post_validator(self):
+        """После нового входа страница поста отдаётся с новым CSRF."""
+        User.objects.create_user(username='EtagLogin', password='password')
+        client = Client(enforce_csrf_checks=True)
+        credentials = {'username': 'EtagLogin', 'password': 'password'}
+        login_url = reverse('users:login')
+
+        def login():
+            client.get(login_url)
+            client.post(login_url, {
+                **credentials,
+                'csrfmiddlewaretoken': client.cookies['csrftoken'].value,
+            })
+
+        login()
+        url = reverse('posts:post_detail', args=(self.post.id,))
+        etag = client.get(url)['ETag']
+        client.post(reverse('users:logout'), {
+            'csrfmiddlewaretoken': client.cookies['csrftoken'].value,
+        })
+        login()
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        response = client.post(
+            reverse('posts:add_comment', args=(self.post.id,)),
+            {
+                'text': 'Комментарий',
+                'csrfmiddlewaretoken': response.context['csrf_token'],
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+
+    def test_edit_changes_feed_validators(self):
+        """Правка поста меняет ETag главной, группы и профиля."""
+        group = Group.objects.create(title='Группа', slug='etag-group')
+        post = Post.objects.create(
+            author=self.author, text='Старый текст', group=group
+        )
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+        ]
+        etags = [self.client.get(url)['ETag'] for url in urls]
+        post.text = 'Новый текст'
+        post.save()
+        for url, etag in zip(urls, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+                self.assertContains(response, 'Новый текст')
+
+    def test_follow_and_comment_change_validators(self):
+        """Подписка меняет ETag профиля, комментарий — ETag поста."""
+        profile_url = reverse('posts:profile', args=(self.author.username,))
+        etag = self.reader_client.get(profile_url)['ETag']
+        self.assertNotModified(self.reader_client, profile_url, etag)
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.reader_client.get(
+            profile_url, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertTrue(response.context['following'])
+
+        detail_url = reverse('posts:post_detail', args=(self.post.id,))
+        etag = self.reader_client.get(detail_url)['ETag']
+        self.assertNotModified(self.reader_client, detail_url, etag)
+        Comment.objects.create(post=self.post, author=self.reader, text='Да')
+        self.assertContains(
+            self.reader_client.get(detail_url, HTTP_IF_NONE_MATCH=etag), 'Да'
+        )
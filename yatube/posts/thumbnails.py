@@ -0,0 +1,188 @@
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from PIL import features
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import (
+    EMPTY_VALUE,
+    KVStore as CachedDbKVStore,
+)
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from core import metrics
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Ширины карточки для srcset; самая широкая — та же 960x339, что
+# строит тег {% thumbnail %} в шаблонах, пока вариантов ещё нет.
+CARD_WIDTHS = (480, 720, 960)
+# Без поддержки WebP в сборке Pillow строятся только JPEG.
+CARD_FORMATS = ('JPEG', 'WEBP') if features.check('webp') else ('JPEG',)
+CARD = ('JPEG', CARD_WIDTHS[-1])
+
+
+def card_geometry(width):
+    return f'{width}x{round(width * 339 / 960)}'
+
+
+POST_THUMBNAILS = {
+    (image_format, width): (
+        card_geometry(width),
+        {'crop': 'center', 'upscale': True, 'format': image_format},
+    )
+    for image_format in CARD_FORMATS
+    for width in CARD_WIDTHS
+}
+
+_executor = None
+
+
+def source_file(source_name):
+    """
+    Картинка поста для sorl. Ключи KV store и имена миниатюр зависят
+    от хранилища исходника, поэтому оно должно быть тем же, что у
+    поля Post.image в теге {% thumbnail post.image %}.
+    """
+    return ImageFile(source_name, Post._meta.get_field('image').storage)
+
+
+def thumbnail_file(source_name, geometry, **options):
+    """
+    Файл миниатюры, который построит sorl для этих параметров.
+
+    Повторяет разбор опций из ThumbnailBackend.get_thumbnail, но не
+    обращается ни к хранилищу, ни к KV store.
+    """
+    backend = default.backend
+    source = source_file(source_name)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, default.storage)
+
+
+def is_generated(source_name):
+    return all(
+        default.kvstore.get(thumbnail_file(source_name, geometry, **options))
+        for geometry, options in POST_THUMBNAILS.values()
+    )
+
+
+def _stored_keys(keys):
+    """Какие из ключей KV store sorl заполнены: кеш и база пачкой."""
+    kvstore = default.kvstore
+    if not isinstance(kvstore, CachedDbKVStore):
+        return {key for key in keys if kvstore._get_raw(key) is not None}
+    found = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    metrics.record('cache_hits', len(found))
+    metrics.record('cache_misses', len(missing))
+    if missing:
+        # Как и sorl, запоминаем в кеше и отсутствующие ключи.
+        stored = dict.fromkeys(missing, EMPTY_VALUE)
+        stored.update(KVStoreModel.objects.filter(
+            key__in=missing
+        ).values_list('key', 'value'))
+        found.update(stored)
+        kvstore.cache.set_many(stored, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+    return {key for key, value in found.items() if value != EMPTY_VALUE}
+
+
+def attach_urls(posts):
+    """
+    Проставляет постам адреса всех вариантов миниатюр одним запросом
+    к KV store вместо отдельного поиска в теге {% thumbnail %} для
+    каждой картинки.
+
+    thumbnail_url — вариант по умолчанию, thumbnail_srcset и
+    thumbnail_webp_srcset — строки для srcset (вторая пустая, если
+    WebP не строится). Постам, у которых
+    построены не все варианты, адреса не проставляются: их картинку
+    строит тег в шаблоне.
+    """
+    # Картинка может быть общей у нескольких постов.
+    files = {}
+    for name in {post.image.name for post in posts if post.image}:
+        for variant, (geometry, options) in POST_THUMBNAILS.items():
+            file = thumbnail_file(name, geometry, **options)
+            files[add_prefix(file.key)] = (name, variant, file)
+    urls = defaultdict(dict)
+    for key in _stored_keys(list(files)):
+        name, variant, file = files[key]
+        urls[name][variant] = file.url
+    for post in posts:
+        found = urls.get(post.image.name, {})
+        if len(found) < len(POST_THUMBNAILS):
+            continue
+        post.thumbnail_url = found[CARD]
+        post.thumbnail_srcset = _srcset(found, 'JPEG')
+        post.thumbnail_webp_srcset = (
+            _srcset(found, 'WEBP') if 'WEBP' in CARD_FORMATS else ''
+        )
+    return posts
+
+
+def _srcset(urls, image_format):
+    return ', '.join(
+        f'{urls[image_format, width]} {width}w' for width in CARD_WIDTHS
+    )
+
+
+def generate(source_name):
+    """Строит все миниатюры картинки, уже готовые берутся из KV store."""
+    for geometry, options in POST_THUMBNAILS.values():
+        get_thumbnail(source_file(source_name), geometry, **options)
+
+
+def _generate_logged(source_name):
+    try:
+        generate(source_name)
+    except Exception:
+        logger.exception('Не удалось построить миниатюры %s', source_name)
+
+
+def _generate_in_worker(source_name):
+    try:
+        _generate_logged(source_name)
+    finally:
+        connection.close()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            settings.POST_THUMBNAIL_WORKERS, thread_name_prefix='thumbnails'
+        )
+    return _executor
+
+
+def generate_later(post):
+    """
+    Ставит построение миниатюр поста в фоновый пул после коммита,
+    чтобы первый читатель не ждал ресайза.
+    """
+    if not post.image:
+        return
+    name = post.image.name
+    if not settings.POST_THUMBNAIL_WORKERS:
+        transaction.on_commit(lambda: _generate_logged(name))
+        return
+    transaction.on_commit(
+        lambda: _get_executor().submit(_generate_in_worker, name)
+    )
@@ -1,10 +1,208 @@
+import base64
+import binascii
+import json
+import math
+from collections.abc import Sequence
+from datetime import datetime
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
 from django.core.paginator import Paginator
+from django.db.models import DateField, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from .counters import feed_count
+from .feeds import cached_page_posts
 
 QUANTUTY_POST_ON_PAGE = 10
+# Больше не помещается в целое SQLite.
+MAX_PK = 2 ** 63 - 1
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator, берущий число записей из счётчика ленты в кеше."""
+
+    def __init__(self, object_list, per_page, count_key, count_tags=None,
+                 **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_key = count_key
+        self.count_tags = count_tags
+
+    @cached_property
+    def count(self):
+        return feed_count(self.count_key, self.object_list, self.count_tags)
+
+
+class CursorPage(Sequence):
+    """Страница, построенная по курсору, без номера и общего счётчика."""
+
+    def __init__(self, object_list, paginator,
+                 next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def load_cursor(cursor):
+    """Содержимое курсора; ValueError, если это не base64 с JSON."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        return json.loads(raw.decode())
+    except (binascii.Error, UnicodeDecodeError) as error:
+        raise ValueError(error)
+
+
+def cursor_state(cursor):
+    """
+    state, с которым CursorPaginator выдал курсор, или None. Нужен до
+    построения queryset, который от него зависит.
+    """
+    try:
+        payload = load_cursor(cursor)
+    except ValueError:
+        return None
+    if isinstance(payload, list) and len(payload) == 4:
+        return payload[3]
+    return None
+
+
+class CursorPaginator:
+    """
+    Keyset-пагинация по паре (key, pk) в порядке убывания.
+
+    Не делает COUNT и OFFSET: каждая страница выбирается условием
+    «строго после курсора», поэтому глубина страницы не влияет на время.
+    """
+
+    def __init__(self, object_list, per_page, key='pub_date', state=None):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.key = key
+        # Переносится в курсорах всех страниц, см. cursor_state.
+        self.state = state
+
+    def encode_cursor(self, direction, obj):
+        value = getattr(obj, self.key)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        payload = [direction, value, obj.pk]
+        if self.state is not None:
+            payload.append(self.state)
+        raw = json.dumps(payload).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    @cached_property
+    def key_is_date(self):
+        """Ключ — поле даты модели; иначе это число, например score."""
+        try:
+            field = self.object_list.model._meta.get_field(self.key)
+        except FieldDoesNotExist:
+            return False
+        return isinstance(field, DateField)
+
+    def decode_value(self, value):
+        """Значение ключа из курсора или None, если оно не того типа."""
+        if self.key_is_date:
+            if not isinstance(value, str):
+                return None
+            value = parse_datetime(value)
+            if value is None or timezone.is_naive(value):
+                return None
+            return value
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return None
+        return value if math.isfinite(value) else None
+
+    def decode_cursor(self, cursor):
+        """
+        (направление, значение ключа, pk) или None для курсора, который
+        не мог выдать encode_cursor: он приходит от клиента.
+        """
+        try:
+            direction, value, pk, *state = load_cursor(cursor)
+            value = self.decode_value(value)
+        except (TypeError, ValueError):
+            return None
+        if (
+            len(state) > 1
+            or direction not in ('next', 'prev') or value is None
+            or isinstance(pk, bool) or not isinstance(pk, int)
+            or not -MAX_PK <= pk <= MAX_PK
+        ):
+            return None
+        return direction, value, pk
+
+    def get_page(self, cursor):
+        """Возвращает страницу после (или перед) курсором."""
+        position = self.decode_cursor(cursor) if cursor else None
+        descending = self.object_list.order_by(f'-{self.key}', '-pk')
+        if position is None:
+            items = list(descending[:self.per_page + 1])
+            return self._page(items[:self.per_page],
+                              has_next=len(items) > self.per_page,
+                              has_previous=False)
+        direction, value, pk = position
+        if direction == 'next':
+            items = list(descending.filter(
+                Q(**{f'{self.key}__lt': value})
+                | Q(**{self.key: value, 'pk__lt': pk})
+            )[:self.per_page + 1])
+            return self._page(items[:self.per_page],
+                              has_next=len(items) > self.per_page,
+                              has_previous=True)
+        items = list(self.object_list.order_by(self.key, 'pk').filter(
+            Q(**{f'{self.key}__gt': value})
+            | Q(**{self.key: value, 'pk__gt': pk})
+        )[:self.per_page + 1])
+        return self._page(items[:self.per_page][::-1],
+                          has_next=True,
+                          has_previous=len(items) > self.per_page)
+
+    def _page(self, items, has_next, has_previous):
+        next_cursor = previous_cursor = None
+        if items and has_next:
+            next_cursor = self.encode_cursor('next', items[-1])
+        if items and has_previous:
+            previous_cursor = self.encode_cursor('prev', items[0])
+        return CursorPage(items, self, next_cursor, previous_cursor)
 
 
-def pagination(request, objects):
-    paginator = Paginator(objects, QUANTUTY_POST_ON_PAGE)
+def pagination(request, objects, count_key=None, cursor=None, tags=None,
+               count_tags=None):
+    if cursor is None:
+        cursor = settings.POSTS_PAGINATION == 'cursor'
+    if cursor:
+        paginator = CursorPaginator(objects, QUANTUTY_POST_ON_PAGE)
+        return paginator.get_page(request.GET.get('cursor'))
+    if count_key is None:
+        paginator = Paginator(objects, QUANTUTY_POST_ON_PAGE)
+    else:
+        paginator = CachedCountPaginator(
+            objects, QUANTUTY_POST_ON_PAGE, count_key, count_tags
+        )
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
+    if tags and count_key is not None:
+        page_obj.object_list = cached_page_posts(page_obj, count_key, tags)
     return page_obj
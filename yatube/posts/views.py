@@ -1,27 +1,121 @@
+from urllib.parse import urlencode
+
 from django.contrib.auth.decorators import login_required
+from django.middleware.csrf import get_token
 from django.shortcuts import render, get_object_or_404, redirect
-from .models import Post, Group, User, Follow
+from django.utils.functional import SimpleLazyObject
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from core import tagged_cache
+from core.transactions import write_atomic
+from .models import Comment, Post, Group, User, Follow
 from .forms import PostForm, CommentForm
-from django.views.decorators.cache import cache_page
-from .utils import pagination
+from .utils import CursorPaginator, cursor_state, pagination
+from .search import search_posts
+from .feeds import (
+    attach_card_versions,
+    fanout_on_read_authors,
+    feed_posts,
+    follow_feed,
+)
+from . import cache_tags, counters, thumbnails
 
 QUANTUTY_POST_ON_PAGE = 10
+COMMENTS_ON_PAGE = 20
+PROFILE_AUTHORS = User.objects.select_related('stats')
+DETAIL_POSTS = Post.objects.select_related('author__stats', 'group')
+
+
+def comments_page(post_id, cursor=None):
+    """Страница комментариев поста от новых к старым, с авторами."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    ).only('text', 'created', 'post_id', 'author__username')
+    paginator = CursorPaginator(comments, COMMENTS_ON_PAGE, key='created')
+    return paginator.get_page(cursor)
+
+
+def page_etag(request, *tags):
+    """
+    ETag HTML-страницы по версиям тегов её данных. Страница зависит
+    и от зрителя (шапка, подписка), поэтому в ключе его id и теги,
+    а адрес с параметрами различает страницы ленты. CSRF-токен в
+    ключе нужен формам: вход его меняет, и форма из прежней копии
+    страницы не прошла бы проверку.
+    """
+    user_id = request.user.pk
+    if user_id is not None:
+        tags += (cache_tags.author(user_id),)
+    # get_token заводит cookie заранее, если её ещё нет: иначе её
+    # выдал бы рендер, и повторный запрос получил бы другой ETag.
+    get_token(request)
+    csrf = request.META['CSRF_COOKIE']
+    return tagged_cache.etag(
+        *tags, key=f'{user_id}:{csrf}:{request.get_full_path()}'
+    )
+
+
+def index_etag(request):
+    return page_etag(request, cache_tags.INDEX)
+
 
+def page_object_or_404(request, queryset, **lookup):
+    """
+    Объект, по которому строится страница. Его читают и etag_func,
+    и сама view, поэтому он запоминается на время запроса.
+    """
+    objects = request.__dict__.setdefault('_page_objects', {})
+    key = (queryset.model, *sorted(lookup.items()))
+    if key not in objects:
+        objects[key] = get_object_or_404(queryset, **lookup)
+    return objects[key]
 
-@cache_page(20, key_prefix='index_page')
+
+def group_etag(request, slug):
+    group = page_object_or_404(request, Group.objects.all(), slug=slug)
+    return page_etag(request, cache_tags.group(group.id))
+
+
+def profile_etag(request, username):
+    author = page_object_or_404(request, PROFILE_AUTHORS, username=username)
+    return page_etag(request, cache_tags.author(author.id))
+
+
+def post_etag(request, post_id):
+    post = page_object_or_404(request, DETAIL_POSTS, id=post_id)
+    # Рядом с постом выводится число постов автора.
+    return page_etag(
+        request, cache_tags.post(post.id), cache_tags.author(post.author_id)
+    )
+
+
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=index_etag)
 def index(request):
-    post_list = Post.objects.all()
-    page_obj = pagination(request, post_list)
+    post_list = feed_posts()
+    page_obj = pagination(
+        request, post_list, counters.index_key(),
+        tags=[cache_tags.INDEX]
+    )
+    thumbnails.attach_urls(page_obj)
+    attach_card_versions(page_obj)
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/index.html', context)
 
 
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=group_etag)
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    page_obj = pagination(request, post_list)
+    group = page_object_or_404(request, Group.objects.all(), slug=slug)
+    post_list = feed_posts(group=group)
+    page_obj = pagination(
+        request, post_list, counters.group_key(group.id),
+        tags=[cache_tags.group(group.id)]
+    )
+    thumbnails.attach_urls(page_obj)
+    attach_card_versions(page_obj)
     context = {
         'page_obj': page_obj,
         'group': group,
@@ -29,10 +123,16 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=profile_etag)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    page_obj = pagination(request, posts)
+    author = page_object_or_404(request, PROFILE_AUTHORS, username=username)
+    posts = feed_posts(author=author)
+    page_obj = pagination(
+        request, posts, counters.author_key(author.id),
+        tags=[cache_tags.author(author.id)]
+    )
+    thumbnails.attach_urls(page_obj)
     following = request.user.is_authenticated
     if following:
         following = author.following.filter(user=request.user).exists()
@@ -40,22 +140,58 @@ def profile(request, username):
         'author': author,
         'page_obj': page_obj,
         'following': following,
+        'header_version': tagged_cache.version(cache_tags.author(author.id)),
     }
     return render(request, 'posts/profile.html', context)
 
 
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    cursor = request.GET.get('cursor')
+    # Число постов для IDF берётся из курсора, чтобы score не менялся
+    # между страницами.
+    total = cursor_state(cursor) if cursor else None
+    if isinstance(total, bool) or not isinstance(total, int) or total < 1:
+        total = Post.objects.count()
+    paginator = CursorPaginator(
+        search_posts(query, total), QUANTUTY_POST_ON_PAGE, key='score',
+        state=total,
+    )
+    page_obj = paginator.get_page(cursor)
+    thumbnails.attach_urls(page_obj)
+    attach_card_versions(page_obj)
+    context = {
+        'page_obj': page_obj,
+        'query': query,
+        'pagination_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=post_etag)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    comments = post.comments.all()
+    post = page_object_or_404(request, DETAIL_POSTS, id=post_id)
     form = CommentForm()
     context = {
         'post': post,
-        'comments': comments,
+        # Первая страница читается, только если фрагмент не в кеше.
+        'comments': SimpleLazyObject(lambda: comments_page(post.id)),
+        'comments_version': tagged_cache.version(cache_tags.post(post.id)),
         'form': form,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    context = {
+        'post': post,
+        'comments': comments_page(post.id, request.GET.get('cursor')),
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(
@@ -66,7 +202,9 @@ def post_create(request):
     if form.is_valid():
         create_form = form.save(commit=False)
         create_form.author = request.user
-        create_form.save()
+        with write_atomic():
+            create_form.save()
+        thumbnails.generate_later(create_form)
         return redirect('posts:profile', create_form.author)
     context = {
         'groups': groups,
@@ -87,7 +225,10 @@ def post_edit(request, post_id):
         instance=post,
     )
     if form.is_valid():
-        form.save()
+        with write_atomic():
+            form.save()
+        if 'image' in form.changed_data:
+            thumbnails.generate_later(post)
         return redirect('posts:post_detail', post.id)
     context = {
         'form': form,
@@ -105,14 +246,21 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with write_atomic():
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = pagination(request, posts)
+    authors = fanout_on_read_authors(request.user.id)
+    posts = follow_feed(request.user, authors)
+    # Новые посты этих авторов меняют только версию их тега.
+    page_obj = pagination(
+        request, posts, counters.follow_key(request.user.id),
+        count_tags=[cache_tags.author(author) for author in sorted(authors)],
+    )
+    thumbnails.attach_urls(page_obj)
     context = {
         'page_obj': page_obj,
         'index': False,
@@ -125,7 +273,8 @@ def follow_index(request):
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if author != request.user:
-        Follow.objects.get_or_create(user=request.user, author=author)
+        with write_atomic():
+            Follow.objects.get_or_create(user=request.user, author=author)
     else:
         return redirect('posts:profile', username)
     return redirect('posts:follow_index')
@@ -133,10 +282,11 @@ def profile_follow(request, username):
 
 @login_required
 def profile_unfollow(request, username):
-    follow_user = get_object_or_404(
-        Follow,
-        user=request.user,
-        author__username=username,
-    )
-    follow_user.delete()
+    with write_atomic():
+        follow_user = get_object_or_404(
+            Follow,
+            user=request.user,
+            author__username=username,
+        )
+        follow_user.delete()
     return redirect('posts:profile', username)
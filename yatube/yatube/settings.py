@@ -30,6 +30,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -46,7 +47,7 @@ TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backend.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -64,10 +65,24 @@ TEMPLATES = [
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
+# core.sqlite_backend ставит прагмы WAL, synchronous, mmap_size и
+# другие на каждое соединение. OPTIONS['pragmas'] переопределяет значения
+# по умолчанию из core.sqlite_backend.base.PRAGMAS, transaction_mode —
+# режим BEGIN для transaction.atomic, write_transaction_mode — для
+# core.transactions.write_atomic вокруг записи.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.sqlite_backend',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'OPTIONS': {
+            'pragmas': {
+                'mmap_size': int(
+                    os.environ.get('YATUBE_SQLITE_MMAP', 256 * 2 ** 20)
+                ),
+            },
+            'transaction_mode': 'DEFERRED',
+            'write_transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
@@ -102,6 +117,10 @@ USE_TZ = True
 STATIC_URL = '/static/'
 
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
+# collectstatic добавляет к именам хеш и сжимает текстовые файлы
+# в .gz и, если установлен пакет brotli, в .br.
+STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
 
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -113,13 +132,97 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
-
-CACHES = {
-    'default': {
+# Картинки постов, миниатюры и статика из манифеста названы хешем
+# содержимого и не меняются.
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+# В развёртывании тело файла отдаёт веб-сервер: 'x-accel-redirect'
+# для nginx (internal location с префиксами ниже) или 'x-sendfile'
+# для Apache и lighttpd; пусто — файл читает Django.
+SENDFILE_MODE = os.environ.get('YATUBE_SENDFILE', '')
+MEDIA_ACCEL_REDIRECT_PREFIX = '/internal-media/'
+STATIC_ACCEL_REDIRECT_PREFIX = '/internal-static/'
+
+# Загрузки больше этого размера пишутся во временный файл по частям.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2 ** 20
+POST_IMAGE_MAX_BYTES = 10 * 2 ** 20
+# Пикселей во всех кадрах вместе: ограничивает память при перекодировании.
+POST_IMAGE_MAX_PIXELS = 40_000_000
+POST_IMAGE_QUALITY = 85
+
+# Хранилище кеша выбирается переменной окружения YATUBE_CACHE.
+# locmem у каждого процесса своё; file и db общие для всех воркеров
+# на машине, для db нужен manage.py createcachetable.
+CACHE_TIERS = {
+    'locmem': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_DIR', os.path.join(BASE_DIR, 'cache')
+        ),
+        'OPTIONS': {'MAX_ENTRIES': 100_000},
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'yatube_cache',
+        'OPTIONS': {'MAX_ENTRIES': 100_000},
+    },
 }
+CACHE_TIER = os.environ.get('YATUBE_CACHE', 'locmem')
+# Размер LRU в памяти процесса перед общим кешем; 0 — без него.
+CACHE_L1_MAX_ENTRIES = int(os.environ.get('YATUBE_CACHE_L1', 0))
+
+if CACHE_L1_MAX_ENTRIES:
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.TwoLevelCache',
+            'LOCATION': 'shared',
+            'OPTIONS': {
+                'L1_MAX_ENTRIES': CACHE_L1_MAX_ENTRIES,
+                'L1_TIMEOUT': 5,
+            },
+        },
+        'shared': CACHE_TIERS[CACHE_TIER],
+    }
+else:
+    CACHES = {
+        'default': CACHE_TIERS[CACHE_TIER],
+    }
 
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
+
+# /metrics/ открыт staff-пользователям, запросам с заголовком
+# «Authorization: Bearer <METRICS_TOKEN>» и адресам METRICS_ALLOWED_IPS.
+# За обратным прокси на той же машине REMOTE_ADDR у всех запросов —
+# адрес прокси, например 127.0.0.1: не вносите его в список, а
+# настройте сборщик на токен или закройте /metrics/ в самом прокси.
+METRICS_TOKEN = os.environ.get('YATUBE_METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = [
+    ip for ip in os.environ.get('YATUBE_METRICS_IPS', '').split(',') if ip
+]
+# Пределы метрик запроса по имени view; превышения пишутся в лог
+# core.middleware. Ключи — queries, db_seconds, template_seconds,
+# duration_seconds.
+VIEW_BUDGETS = {
+    'posts:index': {'queries': 5, 'db_seconds': 0.05},
+    'posts:group_list': {'queries': 5, 'db_seconds': 0.05},
+    'posts:profile': {'queries': 5, 'db_seconds': 0.05},
+    'posts:follow_index': {'queries': 5, 'db_seconds': 0.05},
+    'posts:post_detail': {'queries': 5, 'db_seconds': 0.05},
+    'posts:search': {'queries': 6, 'db_seconds': 0.1},
+}
+
+FEED_FANOUT_LIMIT = 5000
+FEED_BACKFILL_SIZE = 500
+FEED_COUNT_TIMEOUT = 60 * 60
+TAGGED_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Потоки для фоновой генерации миниатюр после коммита; 0 — строить их
+# сразу в том же запросе. Тесты с временным MEDIA_ROOT ставят 0, чтобы
+# поток не писал в уже удалённый каталог.
+POST_THUMBNAIL_WORKERS = int(os.environ.get('YATUBE_THUMBNAIL_WORKERS', 2))
+
+POSTS_PAGINATION = 'pages'